@@ -0,0 +1,119 @@
+import threading
+import numpy as np
+import soundfile as sf
+
+
+class AudioRingBuffer:
+    """
+    预分配的单生产者/单消费者环形缓冲。
+
+    音频回调只做一次（跨越尾部时两次）切片拷贝，不分配内存也不加锁：
+    write_index 只由回调线程修改，read_index 只由写盘线程修改。
+    """
+
+    def __init__(self, capacity_frames, channels, dtype='float32'):
+        self.capacity = capacity_frames
+        self.channels = channels
+        self.buffer = np.zeros((capacity_frames, channels), dtype=dtype)
+        self.write_index = 0
+        self.read_index = 0
+        self.overflows = 0
+        self.dropped_frames = 0
+
+    def available(self):
+        return self.write_index - self.read_index
+
+    def write(self, data):
+        """
+        写入一块音频，缓冲已满时丢弃放不下的部分并记一次溢出。
+        """
+        frames = len(data)
+        free = self.capacity - (self.write_index - self.read_index)
+        if frames > free:
+            self.overflows += 1
+            self.dropped_frames += frames - free
+            frames = free
+        if frames <= 0:
+            return 0
+        start = self.write_index % self.capacity
+        first = min(frames, self.capacity - start)
+        self.buffer[start:start + first] = data[:first]
+        if frames > first:
+            self.buffer[:frames - first] = data[first:frames]
+        self.write_index += frames
+        return frames
+
+    def read_into(self, out):
+        """
+        把可读数据拷贝到 out，返回实际帧数。
+        """
+        frames = min(len(out), self.available())
+        if frames <= 0:
+            return 0
+        start = self.read_index % self.capacity
+        first = min(frames, self.capacity - start)
+        out[:first] = self.buffer[start:start + first]
+        if frames > first:
+            out[first:frames] = self.buffer[:frames - first]
+        self.read_index += frames
+        return frames
+
+
+class AudioFileWriter:
+    """
+    写盘线程：从环形缓冲按块取出音频，原地做增益和限幅后流式写入 WAV/FLAC 文件。
+    每隔 flush_seconds 刷新一次文件头，进程被杀时已写入的音频仍可读取。
+    """
+
+    def __init__(self, ring, path, samplerate, gain=1.0, block_frames=4096, format=None, subtype=None,
+                 flush_seconds=1.0):
+        self.ring = ring
+        self.path = path
+        self.samplerate = samplerate
+        self.gain = gain
+        self.format = format
+        self.subtype = subtype
+        self.block = np.zeros((block_frames, ring.channels), dtype=ring.buffer.dtype)
+        self.frames_written = 0
+        self.flush_frames = int(samplerate * flush_seconds)
+        self.frames_since_flush = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.file = None
+
+    def start(self):
+        self.file = sf.SoundFile(self.path, mode='w', samplerate=self.samplerate, channels=self.ring.channels,
+                                 format=self.format, subtype=self.subtype)
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+
+    def _write_loop(self):
+        while True:
+            frames = self.ring.read_into(self.block)
+            if frames == 0:
+                if self.stop_event.is_set():
+                    break
+                self.stop_event.wait(0.02)
+                continue
+            chunk = self.block[:frames]
+            if self.gain != 1.0:
+                chunk *= self.gain
+            np.clip(chunk, -1, 1, out=chunk)
+            self.file.write(chunk)
+            self.frames_written += frames
+            self.frames_since_flush += frames
+            if self.flush_frames and self.frames_since_flush >= self.flush_frames:
+                self.file.flush()
+                self.frames_since_flush = 0
+
+    def close(self):
+        """
+        写完缓冲中剩余的数据并关闭文件，返回写入的帧数。
+        """
+        if self.thread is None:
+            return self.frames_written
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        self.file.close()
+        return self.frames_written
@@ -0,0 +1,81 @@
+"""
+采集后端吞吐量基准：对每个可用后端分别测量整屏和区域采集的帧率。
+指定 --camera 时再测量整屏采集加摄像头画中画合成的帧率（摄像头在后台线程读取）。
+
+用法: python benchmarks/bench_capture.py [--backend synthetic] [--seconds 3] [--video path] [--camera 0|path]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_backends import CAPTURE_BACKENDS, create_capture_backend
+from camera_capture import CameraCapture, PictureInPicture
+
+
+def measure(grab, seconds):
+    frames = 0
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        grab()
+        frames += 1
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    return frames / elapsed, cpu / max(frames, 1) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="采集后端吞吐量基准")
+    parser.add_argument('--backend', action='append', help="要测试的后端，可重复指定，默认测试全部")
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--video', help="video 后端使用的视频文件")
+    parser.add_argument('--region', default='640x360', help="区域采集尺寸 WxH")
+    parser.add_argument('--camera', help="摄像头编号或视频文件，测量画中画合成的开销")
+    args = parser.parse_args()
+
+    camera = None
+    if args.camera:
+        camera = CameraCapture(int(args.camera) if args.camera.isdigit() else args.camera).start()
+        deadline = time.perf_counter() + 5.0
+        while camera.get_size() is None and camera.error is None and time.perf_counter() < deadline:
+            time.sleep(0.05)
+        if camera.get_size() is None:
+            print(f"摄像头不可用: {camera.error or '5 秒内没有画面'}")
+            camera.stop()
+            camera = None
+    pip = PictureInPicture()
+
+    region_w, region_h = (int(v) for v in args.region.split('x'))
+    names = args.backend or list(CAPTURE_BACKENDS)
+    print(f"{'backend':<10} {'mode':<8} {'size':<11} {'fps':>9} {'cpu ms/frame':>13}")
+    for name in names:
+        kwargs = {'path': args.video} if name == 'video' else {}
+        if name == 'video' and not args.video:
+            continue
+        try:
+            backend = create_capture_backend(name, **kwargs)
+        except Exception as e:
+            print(f"{name:<10} 不可用: {e}")
+            continue
+        try:
+            width, height = backend.get_size()
+            fps, cpu_ms = measure(backend.grab, args.seconds)
+            print(f"{name:<10} {'full':<8} {f'{width}x{height}':<11} {fps:>9.1f} {cpu_ms:>13.2f}")
+            w, h = min(region_w, width), min(region_h, height)
+            fps, cpu_ms = measure(lambda: backend.grab_region(0, 0, w, h), args.seconds)
+            print(f"{name:<10} {'region':<8} {f'{w}x{h}':<11} {fps:>9.1f} {cpu_ms:>13.2f}")
+            if camera is not None:
+                fps, cpu_ms = measure(lambda: pip.draw(backend.grab(), camera), args.seconds)
+                print(f"{name:<10} {'full+pip':<8} {f'{width}x{height}':<11} {fps:>9.1f} {cpu_ms:>13.2f}")
+        finally:
+            backend.close()
+    if camera is not None:
+        print(f"摄像头: {camera.frames} 帧, 读取失败 {camera.read_failures} 次")
+        camera.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+编码配置基准：用合成图案编码一段短片，按配置和容器报告编码帧率、CPU 时间和输出大小。
+
+CPU 时间取自 os.times() 的子进程时间，Windows 上该值恒为 0，只能参考帧率和大小。
+
+用法: python benchmarks/bench_encoders.py [--frames 300] [--size 1920x1080] [--container mp4 --container webm]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_backends import SyntheticBackend
+from encoder import StreamingEncoder
+from encoder_profiles import ENCODER_PROFILES
+
+
+def child_cpu_seconds():
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+def bench_profile(profile, container, frames, width, height, fps, work_dir):
+    source = SyntheticBackend(width, height)
+    # 预先生成帧，避免把合成图案的开销算进编码时间
+    clip = [source.grab() for _ in range(min(frames, int(fps)))]
+    output_file = os.path.join(work_dir, f'{profile}.{container}')
+    encoder = StreamingEncoder(output_file, width, height, fps, profile=profile, container=container,
+                               max_queue_frames=len(clip), log_file=os.path.join(work_dir, 'encoder.log'))
+    cpu_start = child_cpu_seconds()
+    start = time.perf_counter()
+    encoder.start()
+    for index in range(frames):
+        # 队列满时等待写入线程，基准中不丢帧
+        while not encoder.write(clip[index % len(clip)]):
+            time.sleep(0.001)
+    encoder.close()
+    elapsed = time.perf_counter() - start
+    cpu = child_cpu_seconds() - cpu_start
+    return frames / elapsed, cpu, os.path.getsize(output_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="编码配置基准")
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--size', default='1920x1080')
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--profile', action='append', help="要测试的配置，可重复指定，默认测试全部")
+    parser.add_argument('--container', action='append', help="要测试的容器，默认 mp4 mkv webm")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.split('x'))
+    profiles = args.profile or list(ENCODER_PROFILES)
+    containers = args.container or ['mp4', 'mkv', 'webm']
+    work_dir = tempfile.mkdtemp()
+    print(f"{args.frames} frames {width}x{height} @ {args.fps:g} fps")
+    print(f"{'profile':<10} {'container':<9} {'fps':>8} {'cpu s':>8} {'size MB':>9} {'realtime':>9}")
+    try:
+        for container in containers:
+            for profile in profiles:
+                try:
+                    fps, cpu, size = bench_profile(profile, container, args.frames, width, height, args.fps, work_dir)
+                except RuntimeError as e:
+                    print(f"{profile:<10} {container:<9} 失败: {e}")
+                    continue
+                print(f"{profile:<10} {container:<9} {fps:>8.1f} {cpu:>8.2f} {size / 1e6:>9.2f} "
+                      f"{fps / args.fps:>8.2f}x")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+并行导出基准：先用无损配置生成一段合成源视频，再分别测量单进程导出和不同进程数的并行导出耗时。
+
+用法: python benchmarks/bench_parallel_export.py [--seconds 30] [--size 1920x1080] [--profile archival]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_backends import SyntheticBackend
+from encoder import StreamingEncoder
+from parallel_export import export_parallel, export_single
+
+
+def make_source(path, seconds, width, height, fps):
+    source = SyntheticBackend(width, height)
+    encoder = StreamingEncoder(path, width, height, fps, profile='lossless', container='mkv',
+                               max_queue_frames=int(fps))
+    encoder.start()
+    for _ in range(int(seconds * fps)):
+        frame = source.grab()
+        while not encoder.write(frame):
+            time.sleep(0.001)
+    encoder.close()
+
+
+def worker_counts(limit):
+    counts = []
+    count = 1
+    while count < limit:
+        counts.append(count)
+        count *= 2
+    counts.append(limit)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并行导出基准")
+    parser.add_argument('--seconds', type=float, default=30.0)
+    parser.add_argument('--size', default='1920x1080')
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--profile', default='archival')
+    parser.add_argument('--format', default='mp4')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.split('x'))
+    work_dir = tempfile.mkdtemp()
+    try:
+        source = os.path.join(work_dir, 'source.mkv')
+        print(f"生成 {args.seconds:g}s {width}x{height} 合成源视频...")
+        make_source(source, args.seconds, width, height, args.fps)
+
+        output = os.path.join(work_dir, f'single.{args.format}')
+        start = time.perf_counter()
+        export_single(source, output, args.format, args.profile)
+        single = time.perf_counter() - start
+        print(f"{'mode':<12} {'workers':>7} {'seconds':>9} {'speedup':>8}")
+        print(f"{'single':<12} {1:>7} {single:>9.2f} {1.0:>7.2f}x")
+
+        for workers in worker_counts(args.max_workers):
+            output = os.path.join(work_dir, f'parallel_{workers}.{args.format}')
+            start = time.perf_counter()
+            export_parallel(source, output, args.format, args.profile, workers=workers)
+            elapsed = time.perf_counter() - start
+            print(f"{'parallel':<12} {workers:>7} {elapsed:>9.2f} {single / elapsed:>7.2f}x")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+启动基准：在独立的子进程中测量各模块的导入耗时、界面从启动到第一次绘制的耗时，
+并检查重模块（moviepy、openai、scipy.signal、sounddevice、pyautogui）没有在导入时被加载。
+超出预算或重模块被提前加载时以非零状态退出，可用于防止启动变慢。
+
+用法: python benchmarks/bench_startup.py [--runs 5] [--max-import-ms 1000] [--max-paint-ms 3000]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ['subtitles', 'speech_audio', 'openai_server', 'postprocess', 'record', 'screen_recorder_ui']
+# 只应在录制、转录或导出时才导入的模块
+LAZY_MODULES = ['moviepy', 'pysrt', 'openai', 'scipy.signal', 'sounddevice', 'pyautogui']
+
+IMPORT_SNIPPET = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+PAINT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+from PyQt5.QtCore import QEvent, QObject, QTimer
+from PyQt5.QtWidgets import QApplication
+import screen_recorder_ui
+imported = time.perf_counter() - start
+app = QApplication(sys.argv)
+window = screen_recorder_ui.ScreenRecorderUI()
+constructed = time.perf_counter() - start
+times = {{}}
+
+class PaintWatcher(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and 'paint' not in times:
+            times['paint'] = time.perf_counter() - start
+            QTimer.singleShot(0, app.quit)
+        return False
+
+watcher = PaintWatcher()
+window.installEventFilter(watcher)
+window.show()
+QTimer.singleShot(10000, app.quit)
+app.exec_()
+window.warmup.wait(30)
+warmed = time.perf_counter() - start
+print(json.dumps({{'import': imported, 'construct': constructed, 'paint': times.get('paint'), 'warmup': warmed,
+                  'tasks': window.warmup.timings}}))
+"""
+
+
+def run_snippet(code):
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, cwd=ROOT)
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        return None, lines[-1] if lines else f'exit {result.returncode}'
+    return json.loads(result.stdout.strip().splitlines()[-1]), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动基准")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-import-ms', type=float, default=1000.0, help="单个模块导入耗时中位数的上限")
+    parser.add_argument('--max-paint-ms', type=float, default=3000.0, help="启动到第一次绘制耗时中位数的上限")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':<22} {'median ms':>10} {'min ms':>8}  eagerly loaded")
+    for module in MODULES:
+        samples = []
+        loaded = set()
+        error = None
+        for _ in range(args.runs):
+            result, error = run_snippet(IMPORT_SNIPPET.format(root=ROOT, module=module, lazy=LAZY_MODULES))
+            if result is None:
+                break
+            samples.append(result['seconds'] * 1000)
+            loaded.update(result['loaded'])
+        if not samples:
+            print(f"{module:<22} {'-':>10} {'-':>8}  无法导入: {error}")
+            continue
+        median = statistics.median(samples)
+        print(f"{module:<22} {median:>10.1f} {min(samples):>8.1f}  {', '.join(sorted(loaded)) or '-'}")
+        if median > args.max_import_ms:
+            failures.append(f"导入 {module} 耗时 {median:.0f} ms，超过 {args.max_import_ms:g} ms")
+        if loaded:
+            failures.append(f"导入 {module} 时提前加载了 {', '.join(sorted(loaded))}")
+
+    print()
+    paints = []
+    for _ in range(args.runs):
+        result, error = run_snippet(PAINT_SNIPPET.format(root=ROOT))
+        if result is None or result['paint'] is None:
+            break
+        paints.append(result)
+    if not paints:
+        print(f"首次绘制: 无法测量 ({error or '窗口未绘制'})")
+    else:
+        for key in ('import', 'construct', 'paint', 'warmup'):
+            print(f"{key:<10} {statistics.median(p[key] for p in paints) * 1000:>9.1f} ms")
+        for name in paints[0]['tasks']:
+            print(f"  warmup {name:<14} {statistics.median(p['tasks'][name] for p in paints) * 1000:>7.1f} ms")
+        paint_ms = statistics.median(p['paint'] for p in paints) * 1000
+        if paint_ms > args.max_paint_ms:
+            failures.append(f"首次绘制耗时 {paint_ms:.0f} ms，超过 {args.max_paint_ms:g} ms")
+
+    if failures:
+        print()
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+字幕流程端到端基准：生成带合成语音的测试视频，通过本地转录服务依次执行
+音频提取、转录、SRT 生成和字幕封装，报告各阶段耗时和吞吐量（音频秒数 / 耗时）。
+
+用法: python benchmarks/bench_subtitle_pipeline.py [--seconds 120] [--latency 0.3] [--latency-per-second 0.02]
+                                                 [--failure-rate 0.05] [--codec opus] [--workers 4] [--burn-in]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_upload_codecs import synthetic_speech
+from local_transcription_server import LocalTranscriptionServer
+from openai_server import OpenAITranscriptionService
+from speech_audio import SAMPLE_RATE, load_audio
+from transcription_client import TranscriptionClient
+
+
+def make_source(path, seconds, work_dir):
+    audio_path = os.path.join(work_dir, 'speech.wav')
+    sf.write(audio_path, synthetic_speech(seconds), SAMPLE_RATE)
+    command = [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={seconds}',
+        '-i', audio_path,
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-shortest', path
+    ]
+    subprocess.run(command, check=True)
+
+
+def timed(stages, name, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    stages.append((name, time.perf_counter() - start))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="字幕流程端到端基准")
+    parser.add_argument('--seconds', type=float, default=120.0)
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--latency-per-second', type=float, default=0.02)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--codec', default='opus')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--chunk-seconds', type=float, default=30.0)
+    parser.add_argument('--burn-in', action='store_true', help="烧录字幕（重新编码），默认封装字幕流")
+    args = parser.parse_args()
+
+    server = LocalTranscriptionServer(latency=args.latency, latency_per_second=args.latency_per_second,
+                                      failure_rate=args.failure_rate).start()
+    work_dir = tempfile.mkdtemp()
+    try:
+        source = os.path.join(work_dir, 'source.mp4')
+        print(f"生成 {args.seconds:g}s 测试视频...")
+        make_source(source, args.seconds, work_dir)
+
+        # 独立的客户端，不与其他基准共享限流状态；关闭缓存以测量真实转录
+        client = TranscriptionClient(server.url, rate=50.0, burst=args.workers, backoff_base=0.05)
+        service = OpenAITranscriptionService(client=client, cache=False)
+        service.upload_codec = args.codec
+        service.max_workers = args.workers
+        service.max_chunk_seconds = args.chunk_seconds
+
+        stages = []
+        samples = timed(stages, 'extract', load_audio, source, SAMPLE_RATE)
+        transcript = timed(stages, 'transcribe', service.transcribe_samples, samples, SAMPLE_RATE)
+        srt_content = timed(stages, 'srt', service.generate_srt_subtitles, transcript)
+        srt_path = os.path.join(work_dir, 'source.srt')
+        with open(srt_path, 'w', encoding='utf-8') as f:
+            f.write(srt_content)
+        timed(stages, 'burn-in' if args.burn_in else 'mux', service.add_subtitles_to_video, source, srt_path,
+              os.path.join(work_dir, 'subtitled.mp4'), args.burn_in)
+
+        audio_seconds = len(samples) / SAMPLE_RATE
+        total = sum(elapsed for _, elapsed in stages)
+        print()
+        print(f"codec={args.codec} workers={args.workers} chunk={args.chunk_seconds:g}s "
+              f"latency={args.latency:g}+{args.latency_per_second:g}/s failure_rate={args.failure_rate:g}")
+        print(f"{'stage':<12} {'seconds':>9} {'share':>7} {'x realtime':>11}")
+        for name, elapsed in stages:
+            print(f"{name:<12} {elapsed:>9.3f} {elapsed / total:>6.1%} {audio_seconds / elapsed:>10.1f}x")
+        print(f"{'total':<12} {total:>9.3f} {1:>6.1%} {audio_seconds / total:>10.1f}x")
+        print(f"字幕段数 {len(transcript['segments'])}, 请求 {server.requests} 次 (失败 {server.failures}), "
+              f"上传 {server.bytes_received / 1e6:.2f} MB")
+    finally:
+        server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+字幕生成基准：构造多小时的合成转录结果（可选带词级时间戳），测量 SRT / WebVTT 生成耗时。
+
+用法: python benchmarks/bench_subtitles.py [--hours 3] [--words]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from subtitles import build_srt, build_vtt
+
+WORDS = ['录制', '屏幕', '字幕', '测试。', '音频，', 'hello', 'world,', 'record', 'screen.', '视频导出识别']
+
+
+def make_transcript(hours, with_words, seed=0):
+    rng = random.Random(seed)
+    segments = []
+    words = []
+    position = 0.0
+    while position < hours * 3600:
+        tokens = [rng.choice(WORDS) for _ in range(rng.randint(5, 60))]
+        duration = len(tokens) * 0.3
+        step = duration / len(tokens)
+        if with_words:
+            words.extend({'word': token, 'start': position + i * step, 'end': position + (i + 1) * step}
+                         for i, token in enumerate(tokens))
+        segments.append({'id': len(segments), 'start': position, 'end': position + duration, 'text': ' '.join(tokens)})
+        position += duration + rng.uniform(0.2, 2.0)
+    transcript = {'segments': segments}
+    if with_words:
+        transcript['words'] = words
+    return transcript
+
+
+def main():
+    parser = argparse.ArgumentParser(description="字幕生成基准")
+    parser.add_argument('--hours', type=float, default=3.0)
+    parser.add_argument('--words', action='store_true', help="带词级时间戳")
+    args = parser.parse_args()
+
+    transcript = make_transcript(args.hours, args.words)
+    print(f"{args.hours:g} 小时, {len(transcript['segments'])} 段, {len(transcript.get('words', []))} 个词")
+    for name, build in (('srt', build_srt), ('vtt', build_vtt)):
+        start = time.perf_counter()
+        content = build(transcript)
+        elapsed = time.perf_counter() - start
+        cues = content.count(' --> ')
+        print(f"{name}: {elapsed:.3f}s, {cues} 条, {len(content) / 1e6:.1f} MB, {cues / elapsed:,.0f} 条/秒")
+
+
+if __name__ == '__main__':
+    main()
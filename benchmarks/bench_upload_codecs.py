@@ -0,0 +1,71 @@
+"""
+上传编码基准：对同一段音频分别用 wav / flac / opus 编码，比较上传字节数、编码耗时，
+指定 --url 时再测量完整的转录往返时间。
+
+用法: python benchmarks/bench_upload_codecs.py [音频或视频文件] [--seconds 60] [--url http://127.0.0.1:8000/v1/audio/transcriptions]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from speech_audio import SAMPLE_RATE, UPLOAD_CODECS, DEFAULT_UPLOAD_BITRATE, load_audio, encode_upload
+from transcription_client import TranscriptionClient
+
+
+def synthetic_speech(seconds, sample_rate=SAMPLE_RATE, seed=0):
+    """
+    生成类似语音的测试信号：带谐波和包络的音节，中间夹着停顿和底噪。
+    """
+    rng = np.random.default_rng(seed)
+    samples = rng.normal(0, 0.003, int(seconds * sample_rate)).astype(np.float32)
+    position = 0
+    while position < len(samples):
+        length = int(rng.uniform(0.15, 0.4) * sample_rate)
+        t = np.arange(min(length, len(samples) - position)) / sample_rate
+        pitch = rng.uniform(100, 250)
+        syllable = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+        samples[position:position + len(t)] += (0.2 * np.hanning(len(t)) * syllable).astype(np.float32)
+        position += length + int(rng.choice([0.05, 0.1, 0.6]) * sample_rate)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="上传编码基准")
+    parser.add_argument('input', nargs='?', help="音频或视频文件，省略时使用合成语音")
+    parser.add_argument('--seconds', type=float, default=60.0)
+    parser.add_argument('--bitrate', default=DEFAULT_UPLOAD_BITRATE)
+    parser.add_argument('--url', help="Whisper 兼容接口地址，提供时测量转录往返时间")
+    parser.add_argument('--api-key', default=os.environ.get('OPENAI_API_KEY', ''))
+    args = parser.parse_args()
+
+    if args.input:
+        samples = load_audio(args.input, SAMPLE_RATE)
+    else:
+        samples = synthetic_speech(args.seconds)
+    duration = len(samples) / SAMPLE_RATE
+    client = TranscriptionClient(args.url, args.api_key) if args.url else None
+    data = {"model": "whisper-1", "response_format": "verbose_json"}
+
+    print(f"音频时长 {duration:.1f}s")
+    print(f"{'codec':<6} {'bytes':>11} {'ratio':>7} {'MB/hour':>8} {'encode s':>9} {'round trip s':>13}")
+    wav_size = len(encode_upload(samples, SAMPLE_RATE, 'wav')[0])
+    for codec in UPLOAD_CODECS:
+        start = time.perf_counter()
+        payload, extension, mime_type = encode_upload(samples, SAMPLE_RATE, codec, args.bitrate)
+        encode_time = time.perf_counter() - start
+        ratio = wav_size / len(payload)
+        per_hour = len(payload) / duration * 3600 / 1e6
+        round_trip = '-'
+        if client:
+            start = time.perf_counter()
+            client.transcribe(payload, f"bench.{extension}", data, mime_type)
+            round_trip = f"{time.perf_counter() - start:.2f}"
+        print(f"{codec:<6} {len(payload):>11} {ratio:>6.1f}x {per_hour:>8.1f} {encode_time:>9.3f} {round_trip:>13}")
+
+
+if __name__ == '__main__':
+    main()
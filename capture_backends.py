@@ -0,0 +1,222 @@
+import os
+import sys
+import threading
+import numpy as np
+import cv2
+
+
+class CaptureBackend:
+    """
+    屏幕采集后端接口。所有后端返回 uint8 RGB、C 连续的 numpy 数组。
+    """
+    name = 'base'
+    pixel_format = 'rgb24'
+
+    def get_size(self):
+        """
+        返回采集源的原生尺寸 (width, height)。
+        """
+        raise NotImplementedError
+
+    def get_origin(self):
+        """
+        返回采集画面左上角在整个虚拟桌面中的坐标 (x, y)。
+        光标位置是虚拟桌面坐标，多显示器时主显示器不一定位于 (0, 0)，绘制光标前需要减去这个原点。
+        """
+        return 0, 0
+
+    def grab(self):
+        """
+        采集整个屏幕。
+        """
+        raise NotImplementedError
+
+    def grab_region(self, x, y, w, h):
+        """
+        采集指定区域。默认实现为整屏采集后裁剪，子类应尽量覆盖为原生区域采集。
+        """
+        frame = self.grab()
+        return np.ascontiguousarray(frame[y:y+h, x:x+w])
+
+    def close(self):
+        pass
+
+
+class D3DShotBackend(CaptureBackend):
+    """
+    Windows DXGI 桌面复制 (d3dshot)。
+    """
+    name = 'd3dshot'
+
+    def __init__(self):
+        import d3dshot
+        self.d3d = d3dshot.create(capture_output="numpy")
+
+    def get_size(self):
+        display = self.d3d.display
+        return display.resolution
+
+    def get_origin(self):
+        position = getattr(self.d3d.display, 'position', None) or {}
+        return position.get('left', 0), position.get('top', 0)
+
+    def grab(self):
+        return self.d3d.screenshot()
+
+    def grab_region(self, x, y, w, h):
+        # d3dshot 的 region 为 (left, top, right, bottom)
+        return np.ascontiguousarray(self.d3d.screenshot(region=(x, y, x + w, y + h)))
+
+
+class MSSBackend(CaptureBackend):
+    """
+    基于 mss 的跨平台采集（Linux 下走 X11 XGetImage / XShm）。
+    """
+    name = 'mss'
+
+    def __init__(self, monitor_index=1):
+        import mss
+        self._mss = mss
+        self.monitor_index = monitor_index
+        # mss 实例绑定创建它的线程（X11 display 句柄），因此按线程分别创建
+        self._local = threading.local()
+        self.monitor = self._get_sct().monitors[monitor_index]
+
+    def _get_sct(self):
+        sct = getattr(self._local, 'sct', None)
+        if sct is None:
+            sct = self._mss.mss()
+            self._local.sct = sct
+        return sct
+
+    def get_size(self):
+        return self.monitor['width'], self.monitor['height']
+
+    def get_origin(self):
+        return self.monitor['left'], self.monitor['top']
+
+    def _grab_box(self, box):
+        shot = self._get_sct().grab(box)
+        # mss 返回 BGRA，cvtColor 同时完成通道转换并输出连续数组
+        return cv2.cvtColor(np.asarray(shot), cv2.COLOR_BGRA2RGB)
+
+    def grab(self):
+        return self._grab_box(self.monitor)
+
+    def grab_region(self, x, y, w, h):
+        box = {'left': self.monitor['left'] + x, 'top': self.monitor['top'] + y, 'width': w, 'height': h}
+        return self._grab_box(box)
+
+    def close(self):
+        sct = getattr(self._local, 'sct', None)
+        if sct is not None:
+            sct.close()
+            self._local.sct = None
+
+
+class SyntheticBackend(CaptureBackend):
+    """
+    合成测试图案：渐变背景加移动色块，用于在无显示器的机器上做基准测试和回归检查。
+    """
+    name = 'synthetic'
+
+    def __init__(self, width=1920, height=1080, block_size=120):
+        self.width = width
+        self.height = height
+        self.block_size = block_size
+        self.frame_index = 0
+        xs = np.linspace(0, 255, width, dtype=np.float32)
+        ys = np.linspace(0, 255, height, dtype=np.float32)
+        self._background = np.empty((height, width, 3), dtype=np.uint8)
+        self._background[:, :, 0] = xs[np.newaxis, :].astype(np.uint8)
+        self._background[:, :, 1] = ys[:, np.newaxis].astype(np.uint8)
+        self._background[:, :, 2] = 128
+
+    def get_size(self):
+        return self.width, self.height
+
+    def _draw_block(self, frame, x, y):
+        # 色块按帧序号移动，保证相邻帧内容不同，避免编码器把静止画面压得过于理想
+        size = self.block_size
+        bx = (self.frame_index * 8) % max(1, self.width - size)
+        by = (self.frame_index * 5) % max(1, self.height - size)
+        h, w = frame.shape[:2]
+        x0, y0 = max(bx - x, 0), max(by - y, 0)
+        x1, y1 = min(bx + size - x, w), min(by + size - y, h)
+        if x0 < x1 and y0 < y1:
+            frame[y0:y1, x0:x1] = (255, 255, 255)
+
+    def grab(self):
+        return self.grab_region(0, 0, self.width, self.height)
+
+    def grab_region(self, x, y, w, h):
+        frame = self._background[y:y+h, x:x+w].copy()
+        self._draw_block(frame, x, y)
+        self.frame_index += 1
+        return frame
+
+
+class VideoFileBackend(CaptureBackend):
+    """
+    回放视频文件作为采集源，读到结尾后从头循环。
+    """
+    name = 'video'
+
+    def __init__(self, path, loop=True):
+        self.path = path
+        self.loop = loop
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"无法打开视频文件: {path}")
+        self.width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.last_frame = None
+
+    def get_size(self):
+        return self.width, self.height
+
+    def grab(self):
+        ret, frame = self.capture.read()
+        if not ret and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.capture.read()
+        if not ret:
+            if self.last_frame is None:
+                raise RuntimeError(f"视频文件没有可读取的帧: {self.path}")
+            return self.last_frame.copy()
+        self.last_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        return self.last_frame
+
+    def close(self):
+        self.capture.release()
+
+
+CAPTURE_BACKENDS = {
+    D3DShotBackend.name: D3DShotBackend,
+    MSSBackend.name: MSSBackend,
+    SyntheticBackend.name: SyntheticBackend,
+    VideoFileBackend.name: VideoFileBackend,
+}
+
+
+def create_capture_backend(name=None, **kwargs):
+    """
+    创建采集后端。未指定名称时读取环境变量 SCREEN_RECORDER_BACKEND，
+    否则 Windows 优先 d3dshot，其它平台使用 mss，都不可用时抛出 RuntimeError。
+    合成图案只在显式指定时使用，避免把测试图案当成屏幕录制下来。
+    """
+    name = name or os.environ.get('SCREEN_RECORDER_BACKEND')
+    if name:
+        if name not in CAPTURE_BACKENDS:
+            raise ValueError(f"未知的采集后端: {name}，可选: {', '.join(CAPTURE_BACKENDS)}")
+        return CAPTURE_BACKENDS[name](**kwargs)
+
+    candidates = ['d3dshot', 'mss'] if sys.platform == 'win32' else ['mss']
+    errors = []
+    for candidate in candidates:
+        try:
+            return CAPTURE_BACKENDS[candidate]()
+        except Exception as e:
+            print(f"采集后端 {candidate} 不可用: {e}")
+            errors.append(f"{candidate}: {e}")
+    raise RuntimeError(f"没有可用的屏幕采集后端 ({'; '.join(errors)})")
@@ -0,0 +1,81 @@
+import time
+
+
+class CaptureScheduler:
+    """
+    单一的、基于截止时间的采集循环。
+
+    第 n 帧的截止时间固定为 start + n / fps，睡眠到截止时间再采集，不会累积漂移，也不做忙等。
+    每帧的时间戳 (PTS) 为开始采集时的时钟读数。
+    错过截止时间时按 missed_frame_policy 处理：
+    - 'drop'：跳过错过的帧位
+    - 'duplicate'：用上一帧补齐错过的帧位，补帧的时间戳取对应帧位的时间
+    """
+    DROP = 'drop'
+    DUPLICATE = 'duplicate'
+
+    # 单次睡眠上限，保证停止请求能及时响应
+    max_sleep = 0.1
+
+    def __init__(self, fps, grab_frame, deliver_frame, missed_frame_policy=DROP, clock=time.perf_counter):
+        if missed_frame_policy not in (self.DROP, self.DUPLICATE):
+            raise ValueError(f"未知的丢帧策略: {missed_frame_policy}")
+        self.fps = fps
+        self.frame_duration = 1 / fps
+        self.grab_frame = grab_frame
+        self.deliver_frame = deliver_frame
+        self.missed_frame_policy = missed_frame_policy
+        self.clock = clock
+        self.frame_index = 0
+        self.captured_frames = 0
+        self.late_frames = 0
+        self.dropped_frames = 0
+        self.duplicated_frames = 0
+        self.last_frame = None
+
+    def slot_pts(self, start, frame_index):
+        return start + frame_index * self.frame_duration
+
+    def run(self, is_running, is_paused, resume_event):
+        start = self.clock()
+        while is_running():
+            if is_paused():
+                resume_event.wait()
+                # 恢复后以当前帧位重新对齐截止时间，避免把暂停时长当作错过的帧
+                start = self.clock() - self.frame_index * self.frame_duration
+                continue
+
+            deadline = start + self.frame_index * self.frame_duration
+            now = self.clock()
+            if now < deadline:
+                time.sleep(min(deadline - now, self.max_sleep))
+                continue
+
+            missed = int((now - deadline) / self.frame_duration)
+            if missed > 0:
+                self.late_frames += 1
+                self.handle_missed(start, missed)
+
+            frame = self.grab_frame()
+            self.last_frame = frame
+            self.deliver_frame(now, frame)
+            self.captured_frames += 1
+            self.frame_index += 1
+
+    def handle_missed(self, start, missed):
+        if self.missed_frame_policy == self.DUPLICATE and self.last_frame is not None:
+            for _ in range(missed):
+                self.deliver_frame(self.slot_pts(start, self.frame_index), self.last_frame)
+                self.frame_index += 1
+            self.duplicated_frames += missed
+        else:
+            self.frame_index += missed
+            self.dropped_frames += missed
+
+    def stats(self):
+        return {
+            'captured_frames': self.captured_frames,
+            'late_frames': self.late_frames,
+            'dropped_frames': self.dropped_frames,
+            'duplicated_frames': self.duplicated_frames,
+        }
@@ -0,0 +1,141 @@
+import os
+import json
+import numpy as np
+import cv2
+
+DEFAULT_CURSOR_SVG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'screen_cursor.svg')
+
+
+class CursorOverlay:
+    """
+    鼠标指针叠加：每个缩放比例只光栅化一次光标精灵 (RGBA)，
+    每帧只在指针下方的 ROI 内原地做 alpha 混合，开销只与光标大小有关，与屏幕尺寸无关。
+    混合在按精灵尺寸预分配的 float32 缓冲中用 out= 完成，四舍五入后一次拷回画面，每帧不分配数组。
+    """
+
+    def __init__(self, svg_path=DEFAULT_CURSOR_SVG, base_size=32):
+        self.svg_path = svg_path
+        self.base_size = base_size
+        self._sprites = {}
+        self._scratch = {}
+
+    def get_sprite(self, scale=1.0):
+        """
+        返回 (premultiplied_rgb, inverse_alpha, hotspot)，两个数组均为 float32，按缩放比例缓存。
+        """
+        key = round(scale, 3)
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            size = max(2, int(round(self.base_size * scale)))
+            rgba = self.rasterize(size).astype(np.float32)
+            alpha = rgba[:, :, 3:4] / 255.0
+            premultiplied = rgba[:, :, :3]
+            hotspot = (rgba.shape[1] // 2, rgba.shape[0] // 2)
+            # alpha 预先扩展到三个通道，逐元素相乘时不需要广播，ufunc 不会为此分配缓冲
+            inverse_alpha = np.ascontiguousarray(np.repeat(1.0 - alpha, 3, axis=2))
+            sprite = (np.ascontiguousarray(premultiplied), inverse_alpha, hotspot)
+            self._sprites[key] = sprite
+        return sprite
+
+    def rasterize(self, size):
+        """
+        返回预乘 alpha 的 RGBA uint8 精灵。
+        """
+        try:
+            rgba = self._rasterize_svg(size)
+            if rgba is not None:
+                return rgba
+        except Exception as e:
+            print(f"光标 SVG 光栅化失败，使用内置圆点: {e}")
+        return self._rasterize_fallback(size)
+
+    def _rasterize_svg(self, size):
+        from PyQt5.QtCore import Qt
+        from PyQt5.QtGui import QImage, QPainter
+        from PyQt5.QtSvg import QSvgRenderer
+
+        renderer = QSvgRenderer(self.svg_path)
+        if not renderer.isValid():
+            return None
+        # 以 4 倍分辨率渲染整张 SVG，再裁剪到不透明区域并缩小，边缘更平滑
+        doc_size = renderer.defaultSize()
+        render_w, render_h = doc_size.width() * 4, doc_size.height() * 4
+        image = QImage(render_w, render_h, QImage.Format_RGBA8888_Premultiplied)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+        renderer.render(painter)
+        painter.end()
+
+        buffer = image.constBits()
+        buffer.setsize(image.byteCount())
+        rgba = np.frombuffer(buffer, dtype=np.uint8).reshape(render_h, image.bytesPerLine() // 4, 4)[:, :render_w]
+        ys, xs = np.nonzero(rgba[:, :, 3])
+        if len(xs) == 0:
+            return None
+        cropped = rgba[ys.min():ys.max() + 1, xs.min():xs.max() + 1]
+        # 预乘格式下缩放不会把透明像素的颜色混进边缘
+        return cv2.resize(cropped, (size, size), interpolation=cv2.INTER_AREA)
+
+    def _rasterize_fallback(self, size):
+        # 与 screen_cursor.svg 一致的红色圆点，带一像素的抗锯齿边缘
+        radius = size / 2.0
+        ys, xs = np.mgrid[0:size, 0:size].astype(np.float32) + 0.5
+        distance = np.sqrt((xs - radius) ** 2 + (ys - radius) ** 2)
+        alpha = np.clip(radius - distance, 0.0, 1.0)
+        rgba = np.empty((size, size, 4), dtype=np.uint8)
+        rgba[:, :, 0] = (alpha * 0xFF).astype(np.uint8)
+        rgba[:, :, 1] = (alpha * 0x3B).astype(np.uint8)
+        rgba[:, :, 2] = (alpha * 0x30).astype(np.uint8)
+        rgba[:, :, 3] = (alpha * 255).astype(np.uint8)
+        return rgba
+
+    def draw(self, frame, x, y, scale=1.0):
+        """
+        把光标原地混合到 frame 上，(x, y) 为指针坐标，超出画面的部分会被裁剪。
+        """
+        premultiplied, inverse_alpha, (hot_x, hot_y) = self.get_sprite(scale)
+        sprite_h, sprite_w = inverse_alpha.shape[:2]
+        frame_h, frame_w = frame.shape[:2]
+
+        left, top = x - hot_x, y - hot_y
+        x0, y0 = max(left, 0), max(top, 0)
+        x1, y1 = min(left + sprite_w, frame_w), min(top + sprite_h, frame_h)
+        if x0 >= x1 or y0 >= y1:
+            return frame
+
+        sx0, sy0 = x0 - left, y0 - top
+        sx1, sy1 = sx0 + (x1 - x0), sy0 + (y1 - y0)
+        roi = frame[y0:y1, x0:x1]
+        scratch = self._scratch.get(premultiplied.shape)
+        if scratch is None:
+            scratch = self._scratch[premultiplied.shape] = np.empty(premultiplied.shape, dtype=np.float32)
+        # 画面边缘裁剪时只使用缓冲的左上角区域
+        blended = scratch[:y1 - y0, :x1 - x0]
+        # 先把 uint8 转成 float32 再相乘，避免 ufunc 为混合类型运算分配类型转换缓冲
+        np.copyto(blended, roi)
+        np.multiply(blended, inverse_alpha[sy0:sy1, sx0:sx1], out=blended)
+        np.add(blended, premultiplied[sy0:sy1, sx0:sx1], out=blended)
+        # 四舍五入而不是截断，否则半透明边缘整体偏暗
+        np.rint(blended, out=blended)
+        np.copyto(roi, blended, casting='unsafe')
+        return frame
+
+
+class CursorMetadataWriter:
+    """
+    不把光标画进画面时，逐帧记录指针位置到 JSON-lines 文件，供后期叠加或分析使用。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, pts, x, y):
+        self.file.write(json.dumps({'pts': round(pts, 6), 'x': int(x), 'y': int(y)}) + '\n')
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+        return self.path
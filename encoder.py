@@ -0,0 +1,217 @@
+import os
+import subprocess
+import threading
+import ffmpeg
+import numpy as np
+from queue import Queue, Full, Empty
+from encoder_profiles import get_container, get_profile
+
+SEGMENT_LIST_NAME = 'segments.ffconcat'
+SEGMENT_PATTERN = 'segment_%05d.mp4'
+
+
+class StreamingEncoder:
+    """
+    边录制边编码：采集线程把原始 RGB 帧放入有界队列，写入线程把帧送进 ffmpeg 进程的 stdin。
+    内存占用只取决于队列长度，与录制时长无关。
+
+    ffmpeg 以恒定帧率读取 rawvideo，因此帧的真实时间戳通过帧位体现：
+    PTS 落在第 round(pts * fps) 个帧位，中间空出的帧位由上一帧重复填充，
+    同一帧位的后续帧被跳过。start_pts 为第一帧的时间戳，封装时用于对齐音频。
+
+    segment_seconds > 0 时 output_file 为目录，ffmpeg 按固定时长切分为分片 MP4，
+    每个分片结束后把它追加到目录下的 segments.ffconcat，进程被杀时已完成的分片不受影响。
+    """
+
+    def __init__(self, output_file, width, height, fps, profile=None, container='mkv',
+                 max_queue_frames=60, log_file=None, segment_seconds=0):
+        self.output_file = output_file
+        self.segment_seconds = segment_seconds
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.profile = get_profile(profile)
+        # container 决定视频编码族 (h264/vp9)，输出文件本身可以是任意能容纳该编码的容器
+        self.container = container
+        self.log_file = log_file
+        self.frames = Queue(maxsize=max_queue_frames)
+        self.process = None
+        self.writer_thread = None
+        self.frames_written = 0
+        self.dropped_frames = 0
+        self.skipped_frames = 0
+        self.next_slot = None
+        self.start_pts = None
+        self.error = None
+
+    def build_command(self):
+        command = [
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-f', 'rawvideo',
+            '-pix_fmt', 'rgb24',
+            '-s', f'{self.width}x{self.height}',
+            '-r', str(self.fps),
+            '-i', '-',
+            # yuv420p 要求宽高为偶数
+            '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+        ]
+        command += self.profile.video_args(self.container)
+        if not self.segment_seconds:
+            command.append(self.output_file)
+            return command
+        # 每个分片以关键帧开头，才能在不重新编码的情况下直接拼接
+        command += [
+            '-force_key_frames', f'expr:gte(t,n_forced*{self.segment_seconds})',
+            '-f', 'segment',
+            '-segment_time', str(self.segment_seconds),
+            '-segment_format', 'mp4',
+            '-segment_format_options', 'movflags=+frag_keyframe+empty_moov+default_base_moof',
+            '-reset_timestamps', '1',
+            '-segment_list', os.path.join(self.output_file, SEGMENT_LIST_NAME),
+            '-segment_list_type', 'ffconcat',
+            os.path.join(self.output_file, SEGMENT_PATTERN),
+        ]
+        return command
+
+    @property
+    def result_file(self):
+        """
+        编码结果：单文件模式为输出文件，分片模式为分片列表。
+        """
+        if self.segment_seconds:
+            return os.path.join(self.output_file, SEGMENT_LIST_NAME)
+        return self.output_file
+
+    def start(self):
+        log = open(self.log_file, 'wb') if self.log_file else subprocess.DEVNULL
+        try:
+            self.process = subprocess.Popen(self.build_command(), stdin=subprocess.PIPE,
+                                            stdout=subprocess.DEVNULL, stderr=log)
+        finally:
+            if self.log_file:
+                log.close()
+        self.writer_thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer_thread.start()
+
+    def write(self, frame, pts=None):
+        """
+        把一帧放入编码队列。队列已满时丢弃该帧并计数，避免阻塞采集线程；
+        被丢弃的帧位会由下一帧重复填充，时间轴保持正确。
+        """
+        if frame.shape[0] != self.height or frame.shape[1] != self.width:
+            raise ValueError(f"帧尺寸 {frame.shape[1]}x{frame.shape[0]} 与编码器尺寸 {self.width}x{self.height} 不一致")
+        if pts is None:
+            slot = self.next_slot if self.next_slot is not None else 0
+        else:
+            slot = int(round(pts * self.fps))
+        if self.next_slot is None:
+            self.next_slot = slot
+            self.start_pts = slot / self.fps
+        if slot < self.next_slot:
+            self.skipped_frames += 1
+            return False
+        repeat = slot - self.next_slot + 1
+        try:
+            self.frames.put_nowait((frame, repeat))
+        except Full:
+            self.dropped_frames += 1
+            return False
+        self.next_slot = slot + 1
+        return True
+
+    def _write_loop(self):
+        while True:
+            try:
+                frame = self.frames.get(timeout=0.5)
+            except Empty:
+                if self.process.poll() is not None:
+                    break
+                continue
+            if frame is None:
+                break
+            frame, repeat = frame
+            try:
+                data = np.ascontiguousarray(frame).data
+                for _ in range(repeat):
+                    self.process.stdin.write(data)
+                self.frames_written += repeat
+            except (BrokenPipeError, OSError) as e:
+                self.error = e
+                break
+
+    def close(self):
+        """
+        送入结束标记，等待队列排空并关闭 ffmpeg，返回 result_file。
+        """
+        if self.process is None:
+            return None
+        while self.writer_thread.is_alive():
+            try:
+                self.frames.put(None, timeout=0.5)
+                break
+            except Full:
+                continue
+        self.writer_thread.join()
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        return_code = self.process.wait()
+        self.process = None
+        if return_code != 0:
+            message = f"ffmpeg 编码进程退出码 {return_code}"
+            if self.log_file and os.path.exists(self.log_file):
+                with open(self.log_file, 'r', encoding='utf-8', errors='replace') as f:
+                    message += f": {f.read()[-2000:]}"
+            raise RuntimeError(message)
+        if self.error:
+            raise RuntimeError(f"写入 ffmpeg 失败: {self.error}")
+        return self.result_file
+
+
+def mux_audio_video(video_file, audio_file, output_file, output_format, audio_offset=0.0, profile=None):
+    """
+    视频流直接复制，只编码音频，一次封装得到最终文件。
+    video_file 可以是单个视频文件，也可以是 ffconcat 分片列表。
+    """
+    if video_file.endswith('.ffconcat'):
+        video = ffmpeg.input(video_file, f='concat', safe=0)
+    else:
+        video = ffmpeg.input(video_file)
+    # 显式选择视频流和音频流，音频来源是带画面的文件时不会多出一路视频
+    streams = [video.video]
+    output_args = {'vcodec': 'copy'}
+    if audio_file:
+        # 音频晚于视频开始时整体后移，早于视频时裁掉开头
+        if audio_offset >= 0:
+            streams.append(ffmpeg.input(audio_file, itsoffset=audio_offset).audio)
+        else:
+            streams.append(ffmpeg.input(audio_file, ss=-audio_offset).audio)
+        output_args.update(get_profile(profile).audio_args(output_format))
+    if output_format in ('mp4', 'mov'):
+        output_args['movflags'] = '+faststart'
+    out = ffmpeg.output(*streams, output_file, **output_args)
+    out = out.overwrite_output()
+    ffmpeg.run(out, capture_stdout=True, capture_stderr=True)
+    return output_file
+
+
+def mux_subtitles(video_file, subtitle_file, output_file, output_format=None, language='chi'):
+    """
+    把字幕作为独立的字幕流封装进视频，音视频流直接复制，不重新编码。
+    output_format 默认取输出文件扩展名；容器不支持字幕流时抛出 ValueError。
+    """
+    output_format = output_format or os.path.splitext(output_file)[1].lstrip('.').lower()
+    codec = get_container(output_format)['subtitle']
+    if codec is None:
+        raise ValueError(f"{output_format} 容器不支持字幕流，请改用 mkv/mp4 或烧录字幕")
+    video = ffmpeg.input(video_file)
+    subtitles = ffmpeg.input(subtitle_file)
+    output_args = {'c': 'copy', 'c:s': codec, 'metadata:s:s:0': f'language={language}'}
+    if output_format in ('mp4', 'mov'):
+        output_args['movflags'] = '+faststart'
+    # 保留原视频的全部流，再加上新的字幕流
+    out = ffmpeg.output(video, subtitles, output_file, **output_args).overwrite_output()
+    ffmpeg.run(out, capture_stdout=True, capture_stderr=True)
+    return output_file
+
@@ -0,0 +1,82 @@
+class EncoderProfile:
+    """
+    命名的编码配置。h264 和 vp9 两套视频参数分别用于 mp4/mkv/mov/avi 和 webm 容器。
+    """
+
+    def __init__(self, name, label, h264_args, vp9_args, pix_fmt='yuv420p', audio_bitrate='192k'):
+        self.name = name
+        self.label = label
+        self.h264_args = h264_args
+        self.vp9_args = vp9_args
+        self.pix_fmt = pix_fmt
+        self.audio_bitrate = audio_bitrate
+
+    def video_args(self, container):
+        codec = get_container(container)['video']
+        if codec == 'vp9':
+            args = ['-c:v', 'libvpx-vp9'] + self.vp9_args
+        else:
+            args = ['-c:v', 'libx264'] + self.h264_args
+        return args + ['-pix_fmt', self.pix_fmt]
+
+    def audio_args(self, container):
+        """
+        返回 ffmpeg-python 的输出参数字典。
+        """
+        codec = get_container(container)['audio']
+        if codec == 'opus':
+            return {'acodec': 'libopus', 'audio_bitrate': self.audio_bitrate}
+        if codec == 'flac':
+            return {'acodec': 'flac'}
+        return {'acodec': 'aac', 'audio_bitrate': self.audio_bitrate}
+
+
+# 容器 -> 视频/音频编码族和软字幕编码（None 表示容器不支持字幕流，只能烧录）
+CONTAINERS = {
+    'mp4': {'video': 'h264', 'audio': 'aac', 'subtitle': 'mov_text'},
+    'mkv': {'video': 'h264', 'audio': 'aac', 'subtitle': 'srt'},
+    'mov': {'video': 'h264', 'audio': 'aac', 'subtitle': 'mov_text'},
+    'avi': {'video': 'h264', 'audio': 'aac', 'subtitle': None},
+    'webm': {'video': 'vp9', 'audio': 'opus', 'subtitle': 'webvtt'},
+}
+
+ENCODER_PROFILES = {
+    'realtime': EncoderProfile(
+        'realtime', '实时 (ultrafast)',
+        h264_args=['-preset', 'ultrafast', '-tune', 'zerolatency', '-crf', '23'],
+        vp9_args=['-deadline', 'realtime', '-cpu-used', '8', '-row-mt', '1', '-crf', '35', '-b:v', '0'],
+    ),
+    'balanced': EncoderProfile(
+        'balanced', '均衡',
+        h264_args=['-preset', 'veryfast', '-crf', '21'],
+        vp9_args=['-deadline', 'good', '-cpu-used', '5', '-row-mt', '1', '-crf', '32', '-b:v', '0'],
+    ),
+    'archival': EncoderProfile(
+        'archival', '存档 (CRF 18)',
+        h264_args=['-preset', 'slow', '-crf', '18'],
+        vp9_args=['-deadline', 'good', '-cpu-used', '2', '-row-mt', '1', '-crf', '24', '-b:v', '0'],
+        audio_bitrate='256k',
+    ),
+    'lossless': EncoderProfile(
+        'lossless', '无损中间格式',
+        h264_args=['-preset', 'ultrafast', '-qp', '0'],
+        vp9_args=['-deadline', 'realtime', '-cpu-used', '8', '-row-mt', '1', '-lossless', '1'],
+        pix_fmt='yuv444p',
+        audio_bitrate='320k',
+    ),
+}
+
+DEFAULT_PROFILE = 'realtime'
+
+
+def get_container(container):
+    if container not in CONTAINERS:
+        raise ValueError(f"不支持的输出格式: {container}，可选: {', '.join(CONTAINERS)}")
+    return CONTAINERS[container]
+
+
+def get_profile(name=None):
+    name = name or DEFAULT_PROFILE
+    if name not in ENCODER_PROFILES:
+        raise ValueError(f"未知的编码配置: {name}，可选: {', '.join(ENCODER_PROFILES)}")
+    return ENCODER_PROFILES[name]
@@ -0,0 +1,245 @@
+import re
+import time
+import threading
+import subprocess
+from collections import deque
+from queue import Queue
+import ffmpeg
+
+# ffmpeg 输出头部中输入文件的时长，未指定时长时用来计算进度
+DURATION_PATTERN = re.compile(r'Duration: (\d+):(\d\d):(\d\d(?:\.\d+)?)')
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class FFmpegProgress:
+    """
+    解析 ffmpeg -progress 输出的 key=value 行，每遇到 progress=continue/end 算一个完整的进度块。
+    """
+
+    def __init__(self, duration=None):
+        self.duration = duration
+        self.out_time = 0.0
+        self.speed = None
+        self.frame = 0
+        self.finished = False
+
+    def feed(self, line):
+        """
+        处理一行输出，完成一个进度块时返回 True。
+        """
+        key, _, value = line.strip().partition('=')
+        if key == 'out_time_us' and value.lstrip('-').isdigit():
+            self.out_time = max(0.0, int(value) / 1e6)
+        elif key == 'speed':
+            try:
+                self.speed = float(value.rstrip('x'))
+            except ValueError:
+                self.speed = None
+        elif key == 'frame' and value.isdigit():
+            self.frame = int(value)
+        elif key == 'progress':
+            self.finished = value == 'end'
+            return True
+        return False
+
+    @property
+    def fraction(self):
+        if self.finished:
+            return 1.0
+        if not self.duration:
+            return None
+        return min(1.0, self.out_time / self.duration)
+
+    @property
+    def eta(self):
+        # 按 ffmpeg 报告的处理速度（媒体秒数 / 墙钟秒数）估算剩余时间
+        if not self.duration or not self.speed:
+            return None
+        return max(0.0, self.duration - self.out_time) / self.speed
+
+
+def run_ffmpeg(command, duration=None, on_progress=None):
+    """
+    运行 ffmpeg 命令，从 -progress pipe:1 读取进度并调用 on_progress(FFmpegProgress)。
+    on_progress 抛出异常（例如取消导出）时终止 ffmpeg 进程。失败时抛出 ffmpeg.Error，与 ffmpeg.run 一致。
+    """
+    command = [command[0], '-nostdin', '-progress', 'pipe:1', '-nostats'] + list(command[1:])
+    progress = FFmpegProgress(duration)
+    stderr_lines = deque(maxlen=200)
+
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, encoding='utf-8', errors='replace')
+
+    def read_stderr():
+        for line in process.stderr:
+            stderr_lines.append(line)
+            if progress.duration is None:
+                match = DURATION_PATTERN.search(line)
+                if match:
+                    hours, minutes, seconds = match.groups()
+                    progress.duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    stderr_thread = threading.Thread(target=read_stderr, daemon=True)
+    stderr_thread.start()
+    try:
+        for line in process.stdout:
+            if progress.feed(line) and on_progress is not None:
+                on_progress(progress)
+        process.wait()
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        stderr_thread.join()
+        process.stdout.close()
+        process.stderr.close()
+    if process.returncode != 0:
+        raise ffmpeg.Error(command[0], None, ''.join(stderr_lines).encode('utf-8'))
+    return progress
+
+
+class ExportJob:
+    """
+    导出队列中的一个任务。func(job) 在工作线程中执行，通过 job.update() 报告进度，
+    update() 同时也是取消检查点：取消后下一次调用抛出 ExportCancelled。
+    """
+
+    def __init__(self, name, func):
+        self.name = name
+        self.func = func
+        self.status = QUEUED
+        self.progress = 0.0
+        self.eta = None
+        self.message = ''
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.session_dir = None  # 录制导出任务所属的会话目录，导出成功后只清理这一个目录
+        self.listener = None  # 由 ExportQueue 设置，状态或进度变化时在工作线程中调用 listener(job)
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+        if self.status == QUEUED:
+            self.status = CANCELLED
+            self.notify()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise ExportCancelled(f"已取消: {self.name}")
+
+    def update(self, fraction=None, message=None, eta=None):
+        """
+        报告进度。fraction 为 None 时只更新说明；未给出 eta 时按已用时间和进度线性估算。
+        """
+        self.check_cancelled()
+        if fraction is not None:
+            self.progress = max(self.progress, min(1.0, fraction))
+            if eta is None and self.progress > 0 and self.started_at is not None:
+                elapsed = time.monotonic() - self.started_at
+                eta = elapsed * (1.0 - self.progress) / self.progress
+            self.eta = eta
+        if message is not None:
+            self.message = message
+        self.notify()
+
+    def notify(self):
+        if self.listener is not None:
+            self.listener(self)
+
+    def run(self):
+        if self.cancelled:
+            self.status = CANCELLED
+            self.notify()
+            return self
+        self.status = RUNNING
+        self.started_at = time.monotonic()
+        self.notify()
+        try:
+            self.result = self.func(self)
+            self.progress = 1.0
+            self.eta = 0.0
+            self.status = DONE
+        except ExportCancelled as e:
+            self.error = e
+            self.status = CANCELLED
+        except Exception as e:
+            print(f"导出任务 {self.name} 失败: {e}")
+            self.error = e
+            self.status = FAILED
+        self.finished_at = time.monotonic()
+        self.notify()
+        return self
+
+
+class ExportQueue:
+    """
+    后台导出队列：任务按提交顺序由工作线程执行，界面线程只接收进度通知。
+    导出本身已由 ffmpeg 和进程池并行，默认只用一个工作线程，避免多个导出争抢 CPU。
+    """
+
+    def __init__(self, max_workers=1, on_update=None):
+        self.max_workers = max_workers
+        self.on_update = on_update
+        self.queue = Queue()
+        self.jobs = []
+        self.lock = threading.Lock()
+        self.workers = []
+
+    def submit(self, job):
+        job.listener = self.notify
+        with self.lock:
+            self.jobs.append(job)
+            if len(self.workers) < self.max_workers:
+                # 守护线程不会阻止进程退出，退出前需要等待导出时调用 shutdown()
+                worker = threading.Thread(target=self._worker, name=f'export-{len(self.workers)}', daemon=True)
+                self.workers.append(worker)
+                worker.start()
+        self.queue.put(job)
+        self.notify(job)
+        return job
+
+    def _worker(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            job.run()
+
+    def notify(self, job):
+        if self.on_update is not None:
+            self.on_update(job)
+
+    def pending(self):
+        with self.lock:
+            return [job for job in self.jobs if job.status not in FINISHED]
+
+    def cancel(self, job=None):
+        """
+        取消指定任务；未指定时取消所有未完成的任务。
+        """
+        for job in [job] if job is not None else self.pending():
+            job.cancel()
+
+    def shutdown(self, cancel=False, wait=True):
+        if cancel:
+            self.cancel()
+        with self.lock:
+            workers = list(self.workers)
+            self.workers = []
+        for _ in workers:
+            self.queue.put(None)
+        if wait:
+            for worker in workers:
+                worker.join()
@@ -0,0 +1,150 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from audio_buffer import AudioRingBuffer
+from speech_audio import SAMPLE_RATE, resample_to_speech, split_on_silence
+from subtitles import format_timestamp, iter_cues
+
+
+class LiveTranscriber:
+    """
+    录制过程中的增量转录。
+
+    音频回调把原始采样写入独立的环形缓冲，后台线程混成单声道并按停顿切出语句窗口，
+    每个窗口重采样到 16 kHz 后提交给线程池转录。窗口按顺序完成后追加到 srt_path，
+    停止录制时只剩最后一个窗口需要等待。
+    """
+
+    def __init__(self, service, sample_rate, channels, srt_path=None, min_window_seconds=5.0,
+                 max_window_seconds=30.0, silence_seconds=0.6, silence_margin_db=12.0, buffer_seconds=30,
+                 max_workers=2):
+        self.service = service
+        self.sample_rate = sample_rate
+        self.srt_path = srt_path
+        self.min_window = int(min_window_seconds * sample_rate)
+        self.max_window_seconds = max_window_seconds
+        self.max_window = int(max_window_seconds * sample_rate)
+        self.silence_frames = int(silence_seconds * sample_rate)
+        self.silence_margin_db = silence_margin_db
+        self.ring = AudioRingBuffer(int(sample_rate * buffer_seconds), channels)
+        self.block = np.zeros((max(1, sample_rate // 20), channels), dtype=np.float32)
+        self.pending = np.zeros(self.max_window + len(self.block), dtype=np.float32)
+        self.pending_frames = 0
+        self.window_start = 0  # 当前窗口第一个采样在整段音频中的位置
+        self.silent_run = 0
+        self.voiced = False  # 当前窗口里是否出现过非静音块
+        self.noise_floor_db = None
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.windows = []  # [(起始秒数, future)]
+        self.committed = 0
+        self.cue_number = 1
+        self._commit_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def feed(self, indata):
+        # 在音频回调中调用，只做一次拷贝
+        self.ring.write(indata)
+
+    def start(self):
+        if self.srt_path:
+            open(self.srt_path, 'w', encoding='utf-8').close()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            frames = self.ring.read_into(self.block)
+            if frames == 0:
+                if self.stop_event.is_set():
+                    break
+                self.stop_event.wait(0.05)
+                continue
+            mono = self.block[:frames].mean(axis=1)
+            self.pending[self.pending_frames:self.pending_frames + frames] = mono
+            self.pending_frames += frames
+            self._track_silence(mono)
+            if self.pending_frames >= self.min_window and self.silent_run >= self.silence_frames:
+                # 在停顿中点切开，前后两个窗口各带一半静音
+                self._submit(self.pending_frames - self.silent_run // 2)
+            elif self.pending_frames >= self.max_window:
+                # 一直没有足够长的停顿，退回到最后一段中能量最低的位置
+                cut = split_on_silence(self.pending[:self.pending_frames], self.sample_rate,
+                                       self.max_window_seconds, search_seconds=self.max_window_seconds / 3)[0][1]
+                self._submit(cut)
+
+    def _track_silence(self, mono):
+        level_db = 10 * np.log10(float(np.mean(mono * mono)) + 1e-10)
+        if self.noise_floor_db is None or level_db < self.noise_floor_db:
+            self.noise_floor_db = level_db
+        else:
+            # 底噪缓慢上浮，环境变吵后阈值也能跟上
+            self.noise_floor_db += 0.01
+        if level_db < self.noise_floor_db + self.silence_margin_db:
+            self.silent_run += len(mono)
+        else:
+            self.silent_run = 0
+            self.voiced = True
+
+    def _submit(self, cut):
+        # 整个窗口都是静音时不上传，Whisper 对静音容易编造文字
+        if self.voiced:
+            window = self.pending[:cut]
+            samples = resample_to_speech(window, self.sample_rate)
+            offset = self.window_start / self.sample_rate
+            future = self.pool.submit(self.service.transcribe_samples, samples, SAMPLE_RATE)
+            self.windows.append((offset, future))
+            future.add_done_callback(lambda _: self._commit_ready())
+        remaining = self.pending_frames - cut
+        # 按停顿切开时剩下的只有静音；强制切开时剩余部分可能仍在说话
+        self.voiced = self.silent_run < remaining
+        self.pending[:remaining] = self.pending[cut:self.pending_frames]
+        self.pending_frames = remaining
+        self.window_start += cut
+        self.silent_run = min(self.silent_run, remaining)
+
+    def _commit_ready(self):
+        """
+        按顺序把已完成的窗口追加到字幕文件，前面的窗口没完成时后面的先等着。
+        """
+        with self._commit_lock:
+            while self.committed < len(self.windows) and self.windows[self.committed][1].done():
+                offset, future = self.windows[self.committed]
+                self.committed += 1
+                if future.exception() is not None or not self.srt_path:
+                    continue
+                with open(self.srt_path, 'a', encoding='utf-8') as f:
+                    for start, end, text in iter_cues(future.result(), self.service.max_cue_chars):
+                        f.write(f"{self.cue_number}\n{format_timestamp(start + offset)} --> "
+                                f"{format_timestamp(end + offset)}\n{text}\n\n")
+                        self.cue_number += 1
+
+    def finish(self, time_offset=0.0):
+        """
+        停止录制后调用：转录剩余的尾部，等待所有窗口完成并合并为一个转录结果。
+        time_offset 是音频起点相对视频起点的偏移，合并后的时间戳对齐到视频。
+        任一窗口失败时抛出异常，调用方可以退回到完整转录。
+        """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.pending_frames > 0:
+            self._submit(self.pending_frames)
+        try:
+            results = [future.result() for _, future in self.windows]
+        finally:
+            self.pool.shutdown(wait=False)
+        print(f"实时转录完成: {len(self.windows)} 个窗口")
+        transcript = self.service.merge_transcripts(results, [offset + time_offset for offset, _ in self.windows])
+        for segment in transcript['segments']:
+            segment['start'] = max(0.0, segment['start'])
+            segment['end'] = max(segment['start'], segment['end'])
+        return transcript
+
+    def cancel(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.pool.shutdown(wait=False, cancel_futures=True)
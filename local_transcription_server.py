@@ -0,0 +1,190 @@
+import io
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import soundfile as sf
+from speech_audio import frame_energy_db
+
+TRANSCRIPTIONS_PATH = '/v1/audio/transcriptions'
+
+# 生成确定性文本用的词表，中英混排，便于检查字幕换行
+WORDS = ['录制', '屏幕', '字幕', '测试', '音频', '视频', '导出', '识别', 'hello', 'world', 'record', 'screen']
+
+
+def parse_multipart(content_type, body):
+    """
+    解析 multipart/form-data，返回 (字段 dict, {字段名: (文件名, bytes)})。
+    """
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body)
+    fields = {}
+    files = {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        filename = part.get_filename()
+        payload = part.get_payload(decode=True)
+        if filename is not None:
+            files[name] = (filename, payload)
+        else:
+            fields.setdefault(name, []).append(payload.decode('utf-8'))
+    return {k: v if len(v) > 1 else v[0] for k, v in fields.items()}, files
+
+
+def fake_transcript(audio_bytes, segment_seconds=3.0, silence_db=-45.0, include_words=False):
+    """
+    根据上传的音频生成确定性的 verbose_json：按 segment_seconds 切段，跳过静音段，
+    文本由音频内容的哈希决定，同一段音频总是得到同一结果。
+    """
+    samples, sample_rate = sf.read(io.BytesIO(audio_bytes), dtype='float32', always_2d=True)
+    mono = samples.mean(axis=1)
+    duration = len(mono) / sample_rate
+    rng = random.Random(hashlib.sha256(audio_bytes).digest())
+    energy_db, frame_size = frame_energy_db(mono, sample_rate)
+    frames_per_segment = max(1, int(segment_seconds * sample_rate / frame_size))
+
+    segments = []
+    words = []
+    start_frame = 0
+    while start_frame < len(energy_db):
+        end_frame = min(start_frame + frames_per_segment, len(energy_db))
+        voiced = np.flatnonzero(energy_db[start_frame:end_frame] > silence_db)
+        if len(voiced):
+            start = (start_frame + voiced[0]) * frame_size / sample_rate
+            end = min(duration, (start_frame + voiced[-1] + 1) * frame_size / sample_rate)
+            tokens = [rng.choice(WORDS) for _ in range(rng.randint(3, 8))]
+            segment = {'id': len(segments), 'seek': 0, 'start': round(start, 3), 'end': round(end, 3),
+                       'text': ' '.join(tokens), 'avg_logprob': -0.2, 'no_speech_prob': 0.01}
+            step = (end - start) / len(tokens)
+            for i, token in enumerate(tokens):
+                words.append({'word': token, 'start': round(start + i * step, 3),
+                              'end': round(start + (i + 1) * step, 3)})
+            segments.append(segment)
+        start_frame = end_frame
+
+    transcript = {'task': 'transcribe', 'language': 'chinese', 'duration': round(duration, 3),
+                  'text': ' '.join(segment['text'] for segment in segments), 'segments': segments}
+    if include_words:
+        transcript['words'] = words
+    return transcript
+
+
+class LocalTranscriptionServer:
+    """
+    本地的 Whisper 兼容转录服务，实现 /v1/audio/transcriptions 的 verbose_json 接口。
+    用于离线测试和性能分析，可配置固定延迟、按音频时长增加的延迟和失败率。
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, latency_per_second=0.0, failure_rate=0.0,
+                 segment_seconds=3.0, seed=0):
+        self.latency = latency
+        self.latency_per_second = latency_per_second
+        self.failure_rate = failure_rate
+        self.segment_seconds = segment_seconds
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.bytes_received = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{TRANSCRIPTIONS_PATH}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def record_request(self, size):
+        """
+        记录一次请求，按失败率决定是否模拟失败。
+        """
+        with self.lock:
+            self.requests += 1
+            self.bytes_received += size
+            fail = self.random.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+            return fail
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.path.split('?')[0] != TRANSCRIPTIONS_PATH:
+                    return self.send_json(404, {'error': {'message': f'未知路径: {self.path}'}})
+                if server.record_request(len(body)):
+                    return self.send_json(503, {'error': {'message': '模拟的服务端错误'}}, {'Retry-After': '0.1'})
+                try:
+                    fields, files = parse_multipart(self.headers.get('Content-Type', ''), body)
+                    if 'file' not in files:
+                        return self.send_json(400, {'error': {'message': '缺少 file 字段'}})
+                    granularities = fields.get('timestamp_granularities[]', [])
+                    transcript = fake_transcript(files['file'][1], server.segment_seconds,
+                                                 include_words='word' in granularities)
+                except Exception as e:
+                    return self.send_json(400, {'error': {'message': f'无法解析请求: {e}'}})
+                time.sleep(server.latency + server.latency_per_second * transcript['duration'])
+                if fields.get('response_format', 'json') != 'verbose_json':
+                    transcript = {'text': transcript['text']}
+                self.send_json(200, transcript)
+
+            def send_json(self, status, payload, headers=None):
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == '__main__':
+    # 用法: python local_transcription_server.py [--port 8000] [--latency 0.5] [--failure-rate 0.1]
+    # 然后设置 TRANSCRIPTION_URL=http://127.0.0.1:8000/v1/audio/transcriptions
+    parser = argparse.ArgumentParser(description="本地 Whisper 兼容转录服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help="每个请求的固定延迟（秒）")
+    parser.add_argument('--latency-per-second', type=float, default=0.0, help="每秒音频增加的延迟（秒）")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="返回 503 的概率")
+    parser.add_argument('--segment-seconds', type=float, default=3.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    server = LocalTranscriptionServer(args.host, args.port, args.latency, args.latency_per_second,
+                                      args.failure_rate, args.segment_seconds, args.seed)
+    print(f"本地转录服务: {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+        sys.exit(0)
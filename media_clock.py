@@ -0,0 +1,82 @@
+import threading
+import time
+
+
+class MediaClock:
+    """
+    音视频共享的单调媒体时钟。
+
+    媒体时间 = 单调时钟 - 起点 - 累计暂停时长。暂停和恢复只修改偏移量，
+    不需要改动任何已经缓冲或编码的帧。
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.origin = None
+            self.paused_at = None
+            self.paused_total = 0.0
+
+    def start(self):
+        with self._lock:
+            self.origin = self.clock()
+            self.paused_at = None
+            self.paused_total = 0.0
+
+    @property
+    def started(self):
+        return self.origin is not None
+
+    @property
+    def paused(self):
+        return self.paused_at is not None
+
+    def now(self):
+        """
+        当前媒体时间（秒）。暂停期间保持不变。
+        """
+        with self._lock:
+            if self.origin is None:
+                return 0.0
+            current = self.paused_at if self.paused_at is not None else self.clock()
+            return current - self.origin - self.paused_total
+
+    def to_media(self, timestamp):
+        """
+        把同一单调时钟的读数（例如其他线程采集时打的时间戳）换算为媒体时间。
+        暂停期间的读数折算到暂停时刻。
+        """
+        with self._lock:
+            if self.origin is None:
+                return 0.0
+            if self.paused_at is not None:
+                timestamp = min(timestamp, self.paused_at)
+            return timestamp - self.origin - self.paused_total
+
+    def pause(self):
+        with self._lock:
+            if self.paused_at is None:
+                self.paused_at = self.clock()
+
+    def resume(self):
+        """
+        恢复计时，返回本次暂停的时长。
+        """
+        with self._lock:
+            if self.paused_at is None:
+                return 0.0
+            duration = self.clock() - self.paused_at
+            self.paused_total += duration
+            self.paused_at = None
+            return duration
+
+    @staticmethod
+    def sample_pts(start_pts, sample_index, sample_rate):
+        """
+        按采样计数计算音频时间戳，不受回调调度抖动影响。
+        """
+        return start_pts + sample_index / sample_rate
@@ -1,93 +1,164 @@
-import openai
 import os
-from pydub import AudioSegment
 import subprocess
-import requests
-import json
-import shlex
-import re
-import platform
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from speech_audio import (SAMPLE_RATE, DEFAULT_UPLOAD_CODEC, DEFAULT_UPLOAD_BITRATE, load_audio,
+                          split_on_silence, encode_upload)
+from transcription_client import TranscriptionError, get_client
+from transcript_cache import default_cache, transcript_key
+from subtitles import build_srt, build_vtt, format_timestamp
+from encoder import mux_subtitles
 
 class OpenAITranscriptionService:
-    def __init__(self):
-        self.api_key = ""
-        self.transcription_url = "https://api.chatanywhere.tech/v1/audio/transcriptions"
+    def __init__(self, api_key=None, transcription_url=None, client=None, cache=None):
+        self.api_key = api_key if api_key is not None else os.environ.get("OPENAI_API_KEY", "")
+        self.transcription_url = (transcription_url or os.environ.get("TRANSCRIPTION_URL")
+                                  or "https://api.chatanywhere.tech/v1/audio/transcriptions")
+        # 同一地址和密钥共享一个带连接池、重试和限流的客户端
+        self.client = client or get_client(self.transcription_url, self.api_key)
+        self.max_chunk_seconds = 300  # 每块不超过 5 分钟，24 kbps Opus 约 0.9 MB，WAV 约 9.6 MB
+        self.max_workers = 4
+        # 上传编码: opus（默认）、flac 或 wav
+        self.upload_codec = os.environ.get("TRANSCRIPTION_UPLOAD_CODEC", DEFAULT_UPLOAD_CODEC)
+        self.upload_bitrate = DEFAULT_UPLOAD_BITRATE
+        self.model = "whisper-1"
+        self.language = "zh"
+        self.prompt = "用户正在制作srt字幕文件,请你返回中文简体文字，如果用户使用了英文，则同时正确返回英文"
+        self.max_cue_chars = 40  # 每条字幕的最大字符数
+        # cache=False 关闭转录缓存
+        self.cache = default_cache() if cache is None else cache
 
     def transcribe_audio(self, audio_file_path):
         """
-        使用指定的 API 地址转录音频文件。
+        使用指定的 API 地址转录音频文件。失败时抛出 TranscriptionError，保留状态码和服务端返回的信息。
         """
-        try:
-            with open(audio_file_path, "rb") as audio_file:
-                files = {"file": audio_file}
-                headers = {"Authorization": f"Bearer {self.api_key}"}
-                data = {"model": "whisper-1","prompt": "用户正在制作srt字幕文件,请你返回中文简体文字，如果用户使用了英文，则同时正确返回英文", "response_format": "verbose_json", "language": "zh"}
-                
-                response = requests.post(self.transcription_url, headers=headers, files=files, data=data)
-                response.raise_for_status()
-                
-                transcript = response.json()
-                return transcript
-        except Exception as e:
-            print(f"转录过程中出错: {str(e)}")
-            return None
+        with open(audio_file_path, "rb") as audio_file:
+            return self.post_transcription(audio_file, os.path.basename(audio_file_path))
 
-    def generate_srt_subtitles(self, transcript):
+    def post_transcription(self, audio_file, filename, content_type=None):
+        # 同时请求词级时间戳，字幕切条时按词计时
+        data = {"model": self.model, "prompt": self.prompt, "response_format": "verbose_json", "language": self.language,
+                "timestamp_granularities[]": ["segment", "word"]}
+        return self.client.transcribe(audio_file, filename, data, content_type)
+
+    def transcribe_audio_chunked(self, media_path):
         """
-        根据转录文本生成 SRT 格式的字幕，优化换行和换页逻辑。
+        解码音频或视频文件后分块并发转录。
         """
-        srt_content = ""
-        subtitle_number = 1
-        current_lines = []
-        current_start_time = None
-
-        segments = transcript['segments']
-        for i, segment in enumerate(segments):
-            words = self.split_text(segment['text'].strip())
-            start_time = self.format_time(segment['start'])
-            end_time = self.format_time(segment['end'])
-
-            if not current_start_time:
-                current_start_time = start_time
-
-            for word in words:
-                if len(' '.join(current_lines + [word])) > 40 or word in ['.', '。', '!', '！', '?', '？']:
-                    # 如果当前行加上新单词超过40个字符，或遇到句子结束标点，就换行
-                    srt_content += f"{subtitle_number}\n{current_start_time} --> {end_time}\n{' '.join(current_lines)}\n\n"
-                    subtitle_number += 1
-                    current_lines = [word] if word not in ['.', '。', '!', '！', '?', '？'] else []
-                    current_start_time = None
-                else:
-                    current_lines.append(word)
-
-            # 处理段落结束
-            if current_lines:
-                srt_content += f"{subtitle_number}\n{current_start_time} --> {end_time}\n{' '.join(current_lines)}\n\n"
-                subtitle_number += 1
-                current_lines = []
-                current_start_time = None
+        return self.transcribe_samples(load_audio(media_path, SAMPLE_RATE), SAMPLE_RATE)
 
-        return srt_content
+    def transcribe_samples(self, samples, sample_rate=SAMPLE_RATE, progress=None):
+        """
+        在低能量处把音频切成有上限的块，用线程池并发转录，再按块偏移合并时间戳。
+        单块的重试由客户端负责，最终失败则整体报错，不会静默丢掉一段字幕。
+        相同音频和识别参数的结果直接从缓存返回，不再上传。
+        progress(完成比例) 在每块完成后调用，抛出异常时取消剩余的块。
+        """
+        cache_key = None
+        if self.cache:
+            cache_key = transcript_key(samples, sample_rate, model=self.model, language=self.language,
+                                       prompt=self.prompt, upload_codec=self.upload_codec)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print(f"使用缓存的转录结果: {cache_key[:12]}")
+                return cached
+
+        chunks = split_on_silence(samples, sample_rate, self.max_chunk_seconds)
+        print(f"音频时长 {len(samples) / sample_rate:.1f} 秒，分为 {len(chunks)} 块转录")
+
+        def transcribe_chunk(index):
+            start, end = chunks[index]
+            payload, extension, content_type = encode_upload(samples[start:end], sample_rate,
+                                                             self.upload_codec, self.upload_bitrate)
+            try:
+                return self.post_transcription(payload, f"chunk_{index:04d}.{extension}", content_type)
+            except TranscriptionError as e:
+                raise TranscriptionError(f"第 {index + 1}/{len(chunks)} 块转录失败: {e}", e.status_code) from e
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as pool:
+            futures = [pool.submit(transcribe_chunk, index) for index in range(len(chunks))]
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    future.result()
+                    if progress is not None:
+                        progress(done / len(futures))
+            except BaseException:
+                # 失败或取消时不再发送尚未开始的块
+                for future in futures:
+                    future.cancel()
+                raise
+            results = [future.result() for future in futures]
+        offsets = [start / sample_rate for start, _ in chunks]
+        transcript = self.merge_transcripts(results, offsets)
+        if cache_key:
+            try:
+                self.cache.put(cache_key, transcript)
+            except OSError as e:
+                print(f"写入转录缓存失败: {e}")
+        return transcript
+
+    def merge_transcripts(self, transcripts, offsets):
+        """
+        把各块的 verbose_json 结果按时间偏移拼接成一个转录结果。
+        """
+        merged = {'text': '', 'segments': [], 'words': []}
+        texts = []
+        for transcript, offset in zip(transcripts, offsets):
+            if not transcript:
+                continue
+            for key in ('language', 'task'):
+                if key in transcript and key not in merged:
+                    merged[key] = transcript[key]
+            texts.append(transcript.get('text', '').strip())
+            for segment in transcript.get('segments', []):
+                segment = dict(segment)
+                segment['id'] = len(merged['segments'])
+                segment['start'] = segment['start'] + offset
+                segment['end'] = segment['end'] + offset
+                if 'words' in segment:
+                    segment['words'] = [dict(w, start=w['start'] + offset, end=w['end'] + offset) for w in segment['words']]
+                merged['segments'].append(segment)
+            for word in transcript.get('words', []):
+                merged['words'].append(dict(word, start=word['start'] + offset, end=word['end'] + offset))
+        merged['text'] = ' '.join(t for t in texts if t)
+        if transcripts and offsets:
+            last = transcripts[-1] or {}
+            merged['duration'] = offsets[-1] + last.get('duration', 0)
+        if not merged['words']:
+            del merged['words']
+        return merged
 
-    def split_text(self, text):
+    def generate_srt_subtitles(self, transcript):
         """
-        将文本分割成单词或字符，保留标点符号。
+        根据转录结果生成 SRT 字幕。单遍输出，有词级时间戳时按词计时，否则按字符数插值。
         """
-        # 使用正则表达式分割文本，保留标点符号
-        return re.findall(r'\w+|[^\s\w]', text)
+        return build_srt(transcript, self.max_cue_chars)
+
+    def generate_vtt_subtitles(self, transcript):
+        return build_vtt(transcript, self.max_cue_chars)
 
     def format_time(self, seconds):
         """
         将秒数格式化为 SRT 时间戳格式。
         """
-        hours = int(seconds / 3600)
-        minutes = int((seconds % 3600) / 60)
-        seconds = seconds % 60
-        return f"{hours:02d}:{minutes:02d}:{seconds:06.3f}".replace('.', ',')
+        return format_timestamp(seconds)
 
-    def add_subtitles_to_video(self, video_path, srt_path, output_path):
+    def add_subtitles_to_video(self, video_path, srt_path, output_path, burn_in=False):
+        """
+        将字幕添加到视频中。默认作为字幕流封装，音视频直接复制；
+        burn_in 或输出容器不支持字幕流时用 subtitles 滤镜烧录进画面（需要重新编码）。
+        """
+        if not burn_in:
+            try:
+                mux_subtitles(video_path, srt_path, output_path)
+                print(f"字幕已作为字幕流封装: {output_path}")
+                return
+            except ValueError as e:
+                print(f"{e}，改为烧录字幕")
+        self.burn_subtitles(video_path, srt_path, output_path)
+
+    def burn_subtitles(self, video_path, srt_path, output_path):
         """
-        使用 FFmpeg 将字幕添加到视频中。
+        使用 FFmpeg subtitles 滤镜把字幕烧录进画面。
         """
         try:
             # 使用 os.path.abspath 获取绝对路径
@@ -134,72 +205,9 @@ class OpenAITranscriptionService:
             print(f"发生未预期的错误: {str(e)}")
             raise
 
-def process_video_with_subtitles(video_path, output_path, srt_path):
+def process_video_with_subtitles(video_path, output_path, srt_path, samples=None, burn_in=False):
     """
-    处理视频，添加字幕，并生成单独的SRT文件。
+    处理视频，添加字幕，并生成单独的SRT文件。实现在 postprocess 管线中，这里保留原有入口。
     """
-    service = OpenAITranscriptionService()
-
-    # 使用绝对路径
-    audio_path = os.path.abspath("temp_audio.wav")
-    video_path = os.path.abspath(video_path)
-    output_path = os.path.abspath(output_path)
-    srt_path = os.path.abspath(srt_path)
-
-    # 打印所有路径以进行调试
-    print(f"处理视频 - 视频文件路径: {video_path}")
-    print(f"处理视频 - 输出文件路径: {output_path}")
-    print(f"处理视频 - 字幕文件路径: {srt_path}")
-    print(f"处理视频 - 临时音频文件路径: {audio_path}")
-
-    # 提取音频
-    extract_audio_command = [
-        'ffmpeg',
-        '-i', video_path,
-        '-vn',
-        '-acodec', 'pcm_s16le',
-        '-ar', '16000',
-        '-ac', '1',
-        '-y',
-        audio_path
-    ]
-
-    try:
-        # 使用 subprocess.run 执行命令，并捕获输出
-        result = subprocess.run(extract_audio_command, check=True, capture_output=True, text=True)
-        print("音频提取成功")
-        print(f"FFmpeg 输出: {result.stdout}")
-    except subprocess.CalledProcessError as e:
-        print(f"音频提取失败: {e.stdout}\n{e.stderr}")
-        raise
-
-    # 转录音频
-    transcript = service.transcribe_audio(audio_path)
-    if transcript:
-        # 生成 SRT 字幕
-        srt_content = service.generate_srt_subtitles(transcript)
-        
-        # 保存 SRT 文件
-        with open(srt_path, "w", encoding="utf-8") as srt_file:
-            srt_file.write(srt_content)
-        
-        print(f"SRT 文件已保存到: {srt_path}")
-        print(f"SRT 文件内容预览:\n{srt_content[:500]}...")  # 打印前500个字符
-
-        # 检查 SRT 文件是否存在
-        if os.path.exists(srt_path):
-            print(f"SRT 文件确实存在于: {srt_path}")
-        else:
-            print(f"错误：SRT 文件不存在于: {srt_path}")
-
-        # 将字幕添加到视频
-        service.add_subtitles_to_video(video_path, srt_path, output_path)
-
-        # 不删除临时音频文件
-        print(f"临时音频文件保存在: {audio_path}")
-    else:
-        print("转录失败，无法生成字幕。")
-        raise Exception("转录失败")
-
-    # 返回所有生成的文件路径
-    return video_path, srt_path, output_path, audio_path
+    from postprocess import process_video_with_subtitles as process
+    return process(video_path, output_path, srt_path, samples, burn_in)
@@ -0,0 +1,125 @@
+import os
+import math
+import shutil
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import ffmpeg
+from encoder_profiles import get_profile
+from encoder import mux_audio_video
+
+
+def probe_duration(source):
+    """
+    返回视频时长（秒）。source 可以是视频文件或 ffconcat 分片列表。
+    """
+    if source.endswith('.ffconcat'):
+        probe = ffmpeg.probe(source, f='concat', safe=0)
+    else:
+        probe = ffmpeg.probe(source)
+    return float(probe['format']['duration'])
+
+
+def input_args(source):
+    if source.endswith('.ffconcat'):
+        return ['-f', 'concat', '-safe', '0', '-i', source]
+    return ['-i', source]
+
+
+def has_audio(source):
+    if source.endswith('.ffconcat'):
+        return False
+    probe = ffmpeg.probe(source)
+    return any(stream['codec_type'] == 'audio' for stream in probe['streams'])
+
+
+def encode_chunk(source, chunk_file, start, duration, video_args, threads):
+    """
+    编码 [start, start + duration) 区间的视频，只输出视频流。
+    在进程池的工作进程中运行，必须是模块级函数。
+    """
+    command = ['ffmpeg', '-y', '-loglevel', 'error', '-ss', f'{start:.6f}'] + input_args(source) + [
+        '-t', f'{duration:.6f}',
+        '-an',
+        '-threads', str(threads),
+    ] + video_args + [chunk_file]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"分块编码失败 ({start:.1f}s): {result.stderr[-2000:]}")
+    return chunk_file
+
+
+def export_parallel(source, output_file, output_format, profile=None, audio_file=None, audio_offset=0.0,
+                    workers=None, chunk_seconds=None, progress=None):
+    """
+    并行导出：按时间切分源视频，在进程池中分块编码，再用 concat 分离器直接拼接，不二次编码。
+
+    每个分块都以 IDR 帧开头且使用闭合 GOP，拼接处不会出现参考跨块的帧。
+    audio_file 为空时沿用源视频中的音频（如果有）。
+    progress(完成比例) 在每块编码完成后调用，抛出异常时取消尚未开始的块。
+    """
+    profile = get_profile(profile)
+    workers = workers or os.cpu_count() or 1
+    duration = probe_duration(source)
+    if chunk_seconds is None:
+        # 每个工作进程分到约 2 块，末尾的慢块不至于拖住整体
+        chunk_seconds = max(2.0, duration / (workers * 2))
+    chunk_count = max(1, math.ceil(duration / chunk_seconds))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    video_args = profile.video_args(output_format)
+    if video_args[1] == 'libx264':
+        video_args = video_args + ['-flags', '+cgop']
+
+    work_dir = tempfile.mkdtemp(prefix='export_')
+    try:
+        chunk_files = [os.path.join(work_dir, f'chunk_{i:05d}.mkv') for i in range(chunk_count)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(encode_chunk, source, chunk_files[i], i * chunk_seconds,
+                            min(chunk_seconds, duration - i * chunk_seconds), video_args, threads)
+                for i in range(chunk_count)
+            ]
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    future.result()
+                    if progress is not None:
+                        progress(done / chunk_count)
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        list_path = os.path.join(work_dir, 'chunks.ffconcat')
+        with open(list_path, 'w', encoding='utf-8') as f:
+            f.write('ffconcat version 1.0\n')
+            for chunk_file in chunk_files:
+                f.write(f"file '{os.path.basename(chunk_file)}'\n")
+
+        if audio_file is None:
+            audio_file = source if has_audio(source) else None
+            audio_offset = 0.0
+        mux_audio_video(list_path, audio_file, output_file, output_format, audio_offset, profile.name)
+        print(f"并行导出完成: {chunk_count} 块, {workers} 个进程, 每进程 {threads} 线程")
+        return output_file
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def export_single(source, output_file, output_format, profile=None):
+    """
+    单进程导出，作为并行导出的对照。
+    """
+    profile = get_profile(profile)
+    command = ['ffmpeg', '-y', '-loglevel', 'error'] + input_args(source) + profile.video_args(output_format)
+    if has_audio(source):
+        audio = profile.audio_args(output_format)
+        command += ['-c:a', audio['acodec']]
+        if 'audio_bitrate' in audio:
+            command += ['-b:a', audio['audio_bitrate']]
+    else:
+        command += ['-an']
+    command.append(output_file)
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"导出失败: {result.stderr[-2000:]}")
+    return output_file
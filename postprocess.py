@@ -0,0 +1,330 @@
+import os
+import ffmpeg
+import numpy as np
+from encoder_profiles import get_container, get_profile
+from parallel_export import export_parallel
+from speech_audio import SAMPLE_RATE, load_audio, load_recorded_audio
+from openai_server import OpenAITranscriptionService
+from export_jobs import ExportCancelled, run_ffmpeg
+
+# 烧录字幕的样式：白字黑边、半透明底、底部居中
+SUBTITLE_STYLE = (
+    'FontName=SimHei,'
+    'FontSize=15,'
+    'PrimaryColour=&H00FFFFFF,'
+    'OutlineColour=&H000000,'
+    'BackColour=&H80000000,'
+    'Bold=1,'
+    'Shadow=0,'
+    'Alignment=2'
+)
+
+# soundfile 可以直接读取的无损格式，转录时不必启动 ffmpeg
+PCM_EXTENSIONS = ('.wav', '.flac')
+
+
+def args_to_kwargs(args):
+    """
+    把 ['-c:v', 'libx264', '-crf', '18'] 形式的参数转换为 ffmpeg-python 的关键字参数。
+    """
+    return {key.lstrip('-'): value for key, value in zip(args[::2], args[1::2])}
+
+
+class Step:
+    """
+    管线中的一个步骤。deps 是必须先完成的步骤名，optional 的步骤失败时管线继续执行。
+    weight 是相对耗时，用于把各步骤的进度折算为整体进度。
+    """
+
+    def __init__(self, name, description, func, deps=(), optional=False, weight=1.0):
+        self.name = name
+        self.description = description
+        self.func = func
+        self.deps = list(deps)
+        self.optional = optional
+        self.weight = weight
+
+
+class PostProcessPipeline:
+    """
+    录制后处理管线：音视频封装、转录、生成字幕文件、封装或烧录字幕。
+
+    先声明输入和需要的产物，再由 plan() 按依赖关系生成步骤：
+    - 所有从同一输入产生的输出（原视频、软字幕版本、烧录版本）合并为一次 ffmpeg 调用；
+    - 转录的音频来源取代价最低的一种：内存中的采样、录制时的 PCM 文件、最后才用 ffmpeg 解码；
+    - 已有字幕文件或转录结果时跳过转录。
+    字幕步骤是可选的，转录失败时仍会产出不带字幕的输出，错误记录在 errors 中。
+    """
+
+    def __init__(self, video_file=None, audio_file=None, audio_offset=0.0, profile=None, service=None,
+                 duration=None):
+        self.video_file = video_file  # 视频文件或 ffconcat 分片列表，可以自带音频
+        self.audio_file = audio_file  # 单独的音频文件，提供时替换视频中的音频
+        self.audio_offset = audio_offset
+        self.duration = duration  # 视频时长，用于计算封装进度；为空时从 ffmpeg 输出中读取
+        self.profile = get_profile(profile).name
+        self.service = service
+        self.outputs = []
+        self.samples = None
+        self.transcript = None
+        self.srt_file = None
+        self.reuse_srt = False
+        self.errors = {}
+        self.completed = []
+        self.job = None
+        self.current = (0.0, 1.0, True, '')  # 当前步骤的 (起始进度, 权重占比, 是否最后一步, 说明)
+
+    def add_output(self, path, output_format=None, subtitles=False, burn_in=False, export_profile=None,
+                   export_workers=None):
+        """
+        声明一个输出文件。subtitles 封装字幕流，burn_in 把字幕烧录进画面；
+        export_profile 与录制配置不同时用进程池重新编码视频。
+        """
+        output_format = output_format or os.path.splitext(path)[1].lstrip('.').lower()
+        get_container(output_format)
+        if export_profile and get_profile(export_profile).name == self.profile:
+            export_profile = None
+        self.outputs.append({'path': path, 'format': output_format, 'subtitles': subtitles or burn_in,
+                             'burn_in': burn_in, 'export_profile': export_profile,
+                             'export_workers': export_workers})
+        return self
+
+    def set_subtitles(self, srt_file, transcript=None, samples=None, reuse_existing=False):
+        """
+        指定字幕文件位置和可选的转录来源。reuse_existing 时已存在的字幕文件直接使用。
+        """
+        self.srt_file = srt_file
+        self.transcript = transcript
+        self.samples = samples
+        self.reuse_srt = reuse_existing
+        return self
+
+    def get_service(self):
+        if self.service is None:
+            self.service = OpenAITranscriptionService()
+        return self.service
+
+    def needs_subtitles(self):
+        return self.srt_file is not None or any(output['subtitles'] for output in self.outputs)
+
+    def plan(self):
+        """
+        生成按依赖排好序的步骤列表。
+        """
+        steps = []
+        subtitle_deps = []
+        if self.needs_subtitles():
+            if self.srt_file is None:
+                base = os.path.splitext(self.outputs[0]['path'])[0]
+                self.srt_file = f"{base}.srt"
+            if self.reuse_srt and os.path.exists(self.srt_file):
+                pass
+            elif self.transcript is not None:
+                steps.append(Step('srt', f"生成字幕 {self.srt_file}", self.write_srt, optional=True, weight=0.1))
+                subtitle_deps = ['srt']
+            else:
+                steps.append(Step('transcribe', f"转录 ({self.describe_audio_source()})", self.transcribe,
+                                  optional=True, weight=3.0))
+                steps.append(Step('srt', f"生成字幕 {self.srt_file}", self.write_srt, ['transcribe'], optional=True,
+                                  weight=0.1))
+                subtitle_deps = ['srt']
+
+        # 需要重新编码的输出先各自导出，带字幕的输出改用第一个重新编码的结果作为视频来源
+        exported = [output for output in self.outputs if output['export_profile']]
+        for output in exported:
+            steps.append(Step(f"export:{output['path']}",
+                              f"重新编码导出 {output['path']} ({output['export_profile']})",
+                              lambda output=output: self.export(output), weight=4.0))
+        source_deps = [f"export:{exported[0]['path']}"] if exported else []
+
+        muxed = [output for output in self.outputs if not output['export_profile']]
+        if muxed:
+            plain = [o for o in muxed if not o['subtitles']]
+            with_subtitles = [o for o in muxed if o['subtitles']]
+            # 烧录需要重新编码整段视频，其余输出只是流复制
+            weight = 4.0 if any(o['burn_in'] for o in muxed) else 1.0
+            if plain:
+                # 不带字幕的输出和带字幕的输出合并为一次调用；字幕失败时只封装不带字幕的输出
+                names = ', '.join(o['path'] for o in muxed)
+                steps.append(Step('mux', f"一次封装: {names}", lambda: self.mux(muxed), source_deps + subtitle_deps,
+                                  weight=weight))
+            else:
+                names = ', '.join(o['path'] for o in with_subtitles)
+                steps.append(Step('mux', f"一次封装: {names}", lambda: self.mux(with_subtitles),
+                                  source_deps + subtitle_deps, optional=True, weight=weight))
+        return steps
+
+    def describe_audio_source(self):
+        if self.samples is not None:
+            return "内存中的音频"
+        if self.audio_file and self.audio_file.lower().endswith(PCM_EXTENSIONS):
+            return f"直接读取 {os.path.basename(self.audio_file)}"
+        return f"ffmpeg 解码 {os.path.basename(self.audio_file or self.video_file)}"
+
+    def run(self, job=None):
+        """
+        依次执行规划好的步骤，返回字幕文件和各输出文件的路径。
+        必需的步骤失败时抛出异常；可选步骤失败时记录在 errors 中并跳过依赖它的步骤。
+        传入导出任务 job 时按步骤权重报告整体进度，取消后在下一次进度报告时抛出 ExportCancelled。
+        """
+        self.job = job
+        steps = self.plan()
+        total = sum(step.weight for step in steps) or 1.0
+        done = 0.0
+        failed = set()
+        for step in steps:
+            self.current = (done / total, step.weight / total, done + step.weight >= total, step.description)
+            done += step.weight
+            if failed & set(step.deps):
+                if step.name == 'mux':
+                    # 字幕失败：仍然产出不带字幕的输出
+                    plain = [o for o in self.outputs if not o['subtitles'] and not o['export_profile']]
+                    if plain:
+                        print(f"[postprocess] 字幕不可用，只封装 {', '.join(o['path'] for o in plain)}")
+                        self.report(0.0)
+                        self.mux(plain)
+                        self.completed.append(step.name)
+                        continue
+                failed.add(step.name)
+                continue
+            print(f"[postprocess] {step.description}")
+            self.report(0.0)
+            try:
+                step.func()
+                self.completed.append(step.name)
+            except ExportCancelled:
+                raise
+            except Exception as e:
+                if not step.optional:
+                    raise
+                message = e.stderr.decode('utf8', errors='replace') if isinstance(e, ffmpeg.Error) and e.stderr else str(e)
+                print(f"[postprocess] {step.name} 失败: {message}")
+                self.errors[step.name] = e
+                failed.add(step.name)
+        return self.results()
+
+    def report(self, fraction, eta=None):
+        """
+        报告当前步骤的进度（0~1，未知时为 None）。步骤剩余时间只在最后一步时代表整体剩余时间。
+        """
+        if self.job is None:
+            return
+        start, weight, last, description = self.current
+        overall = None if fraction is None else start + weight * fraction
+        self.job.update(overall, description, eta if last else None)
+
+    def results(self):
+        subtitles_ok = self.needs_subtitles() and not self.errors and self.srt_file and os.path.exists(self.srt_file)
+        return {
+            'srt_file': self.srt_file if subtitles_ok else None,
+            'outputs': [o['path'] for o in self.outputs if os.path.exists(o['path'])
+                        and (subtitles_ok or not o['subtitles'])],
+            'errors': dict(self.errors),
+        }
+
+    def transcribe(self):
+        service = self.get_service()
+        samples = self.samples
+        if samples is None:
+            if self.audio_file and self.audio_file.lower().endswith(PCM_EXTENSIONS):
+                samples = load_recorded_audio(self.audio_file, self.audio_offset if self.video_file else 0.0)
+            elif self.audio_file:
+                samples = load_audio(self.audio_file, SAMPLE_RATE)
+                shift = int(round(self.audio_offset * SAMPLE_RATE)) if self.video_file else 0
+                if shift > 0:
+                    samples = np.concatenate([np.zeros(shift, dtype=np.float32), samples])
+                elif shift < 0:
+                    samples = samples[-shift:]
+            else:
+                samples = load_audio(self.video_file, SAMPLE_RATE)
+        self.transcript = service.transcribe_samples(samples, SAMPLE_RATE, progress=self.report)
+        if not self.transcript.get('segments'):
+            raise ValueError("转录结果为空")
+
+    def write_srt(self):
+        with open(self.srt_file, 'w', encoding='utf-8') as f:
+            f.write(self.get_service().generate_srt_subtitles(self.transcript))
+
+    def export(self, output):
+        export_parallel(self.video_file, output['path'], output['format'], output['export_profile'],
+                        audio_file=self.audio_file, audio_offset=self.audio_offset,
+                        workers=output['export_workers'], progress=self.report)
+
+    def source_file(self):
+        # 有重新编码的输出时，带字幕的输出以它为视频来源，它已包含音频
+        for output in self.outputs:
+            if output['export_profile']:
+                return output['path'], None, 0.0, output['export_profile']
+        return self.video_file, self.audio_file, self.audio_offset, self.profile
+
+    def mux(self, outputs):
+        """
+        用一次 ffmpeg 调用生成全部输出：视频流复制，单独的音频按容器编码，
+        软字幕作为字幕流封装，烧录输出经 subtitles 滤镜重新编码视频。
+        """
+        video_file, audio_file, audio_offset, profile = self.source_file()
+        profile = get_profile(profile)
+        if video_file.endswith('.ffconcat'):
+            video_input = ffmpeg.input(video_file, f='concat', safe=0)
+        else:
+            video_input = ffmpeg.input(video_file)
+        if audio_file:
+            # 音频晚于视频开始时整体后移，早于视频时裁掉开头
+            if audio_offset >= 0:
+                audio = ffmpeg.input(audio_file, itsoffset=audio_offset).audio
+            else:
+                audio = ffmpeg.input(audio_file, ss=-audio_offset).audio
+        else:
+            audio = video_input['a?']
+        subtitle_input = None
+        if any(output['subtitles'] and not output['burn_in'] for output in outputs):
+            subtitle_input = ffmpeg.input(self.srt_file)
+
+        nodes = []
+        for output in outputs:
+            output_format = output['format']
+            args = {'acodec': 'copy'}
+            if audio_file:
+                args.update(profile.audio_args(output_format))
+            if output['burn_in']:
+                video = video_input.video.filter('subtitles', filename=self.srt_file.replace('\\', '/'),
+                                                 force_style=SUBTITLE_STYLE)
+                args.update(args_to_kwargs(profile.video_args(output_format)))
+                streams = [video, audio]
+            else:
+                args['vcodec'] = 'copy'
+                streams = [video_input.video, audio]
+                if output['subtitles']:
+                    codec = get_container(output_format)['subtitle']
+                    if codec is None:
+                        raise ValueError(f"{output_format} 容器不支持字幕流，请改用 mkv/mp4 或烧录字幕")
+                    streams.append(subtitle_input)
+                    args.update({'c:s': codec, 'metadata:s:s:0': 'language=chi'})
+            if output_format in ('mp4', 'mov'):
+                args['movflags'] = '+faststart'
+            nodes.append(ffmpeg.output(*streams, output['path'], **args))
+        command = ffmpeg.compile(ffmpeg.merge_outputs(*nodes).overwrite_output())
+        run_ffmpeg(command, self.duration, lambda progress: self.report(progress.fraction, progress.eta))
+
+
+def process_video_with_subtitles(video_path, output_path, srt_path, samples=None, burn_in=False, job=None):
+    """
+    为已有视频生成字幕文件（已存在时直接使用）并输出带字幕的视频，返回 (原视频, 字幕文件, 带字幕的视频)。
+    """
+    video_path = os.path.abspath(video_path)
+    output_path = os.path.abspath(output_path)
+    srt_path = os.path.abspath(srt_path)
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(f"原始视频文件不存在: {video_path}")
+    output_format = os.path.splitext(output_path)[1].lstrip('.').lower()
+    if not burn_in and get_container(output_format)['subtitle'] is None:
+        print(f"{output_format} 容器不支持字幕流，改为烧录字幕")
+        burn_in = True
+
+    pipeline = PostProcessPipeline(video_path)
+    pipeline.set_subtitles(srt_path, samples=samples, reuse_existing=True)
+    pipeline.add_output(output_path, output_format, subtitles=True, burn_in=burn_in)
+    results = pipeline.run(job)
+    if pipeline.errors:
+        raise next(iter(pipeline.errors.values()))
+    return video_path, results['srt_file'], output_path
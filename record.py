@@ -1,28 +1,44 @@
 import numpy as np
 import cv2
-import sounddevice as sd
-import soundfile as sf
 import tempfile
 import os
+import shutil
 import time
 import threading
-import d3dshot
 import ffmpeg
-from queue import Queue
-from collections import deque
-from scipy import signal
-import pyautogui
+from encoder import StreamingEncoder
+from encoder_profiles import DEFAULT_PROFILE, get_container, get_profile
+from capture_backends import create_capture_backend
+from capture_scheduler import CaptureScheduler
+from cursor_overlay import CursorOverlay, CursorMetadataWriter
+from camera_capture import CameraCapture, PictureInPicture
+from audio_buffer import AudioRingBuffer, AudioFileWriter
+from media_clock import MediaClock
+from segments import SessionJournal, create_session_dir
+from live_transcription import LiveTranscriber
+from openai_server import OpenAITranscriptionService
+from postprocess import PostProcessPipeline
+from export_jobs import ExportJob
+from telemetry import Telemetry, DEPTH_BUCKETS, METRICS_FORMATS
 
 class ScreenRecorder:
-    def __init__(self):
+    def __init__(self, capture_backend=None):
         self.recording = False
         self.audio_level = 0
         self.temp_dir = tempfile.mkdtemp()
         self.audio_thread = None
         self.video_thread = None
-        self.audio_frames = []
-        self.video_frames = Queue()
-        self.d3d = d3dshot.create(capture_output="numpy")
+        self.audio_ring = None
+        self.audio_writer = None
+        self.audio_buffer_seconds = 10  # 环形缓冲容量，写盘线程落后超过该时长才会丢数据
+        self.audio_file_format = 'wav'
+        self.audio_volume = 1.0
+        # 采集后端在第一次使用时创建（或由 warm_up 在后台提前创建），构造录制器不阻塞界面
+        self.capture_backend = capture_backend
+        self._capture = None
+        self._capture_lock = threading.Lock()
+        self.cursor_position = None
+        self.cursor_import_error = None
         self.audio_sample_rate = 44100
         self.audio_channels = 2
         self.audio_dtype = 'float32'
@@ -31,112 +47,362 @@ class ScreenRecorder:
         self.video_fps = 30.0
         self.frame_duration = 1 / self.video_fps
         self.start_time = None
-        self.pause_start_time = None
-        self.total_pause_time = 0
         self.recording_area = None
-        self.sync_buffer = deque(maxlen=100)
         self.start_event = threading.Event()
-        self.pause_time = 0
+        # 音视频共享的媒体时钟：视频按采集时刻打时间戳，音频按采样计数打时间戳
+        self.media_clock = MediaClock()
+        self.audio_start_pts = None
         self.last_frame_time = 0
         self.last_audio_time = 0
         self.frame_count = 0
         self.audio_sample_count = 0
-        self.recording_start_time = None
         self.test_audio_running = False
         self.camera_enabled = False
         self.camera = None
         self.camera_frame = None
+        self.camera_source = 0
+        self.camera_sequence = 0
+        # 开启后把摄像头画面以画中画形式合成进录制的画面
+        self.camera_pip = False
+        self.pip = PictureInPicture()
+        self.pip_frames = 0
+        self.pip_max_lag = 0.0
         self.mouse_position = (0, 0)  # 新增: 存储鼠标位置
+        self.encoder = None  # 边录制边编码，内存占用与录制时长无关
+        self.encoder_profile = DEFAULT_PROFILE
+        self.segment_seconds = 10  # 分片时长，崩溃时最多丢失最后一个分片
+        # 设置后录制时用 encoder_profile 快速编码，停止后用进程池按 export_profile 并行重新编码
+        self.export_profile = None
+        self.export_workers = None
+        self.session_dir = None
+        self.journal = None
+        self.encoder_queue_frames = 60
+        self.output_format = 'mp4'
+        self.first_frame_time = None
+        self.scheduler = None
+        self.missed_frame_policy = CaptureScheduler.DROP  # 错过截止时间时丢帧或复制上一帧
+        self.cursor_mode = 'overlay'  # 'overlay' 画进画面, 'metadata' 只记录位置, 'none' 不处理
+        self.cursor_scale = 1.0
+        self.cursor_overlay = CursorOverlay()
+        self.cursor_writer = None
+        # 开启后录制过程中就按语句窗口转录，停止时只需等待最后一个窗口
+        self.live_transcription = False
+        self.live_transcriber = None
+        self.subtitle_file = None
+        # 'soft' 封装字幕流, 'burn' 烧录进画面, None 不生成字幕；字幕直接从录制的音频转录
+        self.subtitle_mode = None
+        self.subtitled_output = None
+        self.subtitle_error = None
+        # 开启后停止录制只做收尾，后处理作为 export_job 交给调用方的导出队列，否则在录制线程中直接执行
+        self.defer_export = False
+        self.export_job = None
+        # 录制指标始终在内存中采样供界面显示；metrics_format 为 'jsonl' 或 'prometheus' 时同时写入 <name>.metrics.*
+        self.metrics_format = None
+        self.metrics_interval = 1.0
+        self.metrics_file = None
+        self.telemetry = Telemetry()
+        self.setup_telemetry()
+
+    @property
+    def capture(self):
+        if self._capture is None:
+            with self._capture_lock:
+                if self._capture is None:
+                    capture = create_capture_backend(self.capture_backend)
+                    print(f"Capture backend: {capture.name} {capture.get_size()} {capture.pixel_format}")
+                    self._capture = capture
+        return self._capture
+
+    @capture.setter
+    def capture(self, backend):
+        self._capture = backend
+
+    def warm_up(self):
+        """
+        提前创建采集后端并导入光标位置模块，供启动时在后台线程调用。
+        """
+        self.load_cursor_position()
+        return self.capture
+
+    def load_cursor_position(self):
+        """
+        需要光标时导入 pyautogui 读取光标位置。cursor_mode 为 'none'，或导入失败（例如没有显示器的 Linux）时
+        返回 None，录制继续进行，只是不包含光标。
+        """
+        if self.cursor_position is None and self.cursor_mode != 'none' and self.cursor_import_error is None:
+            try:
+                import pyautogui
+                self.cursor_position = pyautogui.position
+            except Exception as e:
+                self.cursor_import_error = e
+                print(f"无法读取光标位置，录制不包含光标: {e}")
+        return self.cursor_position
+
+    def setup_telemetry(self):
+        t = self.telemetry
+        self.metric_grab = t.histogram('capture_grab_seconds', help='采集一帧的耗时')
+        self.metric_cursor = t.histogram('cursor_draw_seconds', help='绘制光标的耗时')
+        self.metric_pip = t.histogram('camera_pip_seconds', help='合成画中画的耗时')
+        self.metric_latency = t.histogram('capture_latency_seconds', help='从采集时刻到帧进入编码队列的延迟')
+        self.metric_queue = t.histogram('encoder_queue_depth', DEPTH_BUCKETS, help='帧进入编码队列时的队列深度')
+        self.metric_frames = t.counter('frames_captured', help='送入编码器的帧数')
+        self.metric_audio_overflows = t.counter('audio_input_overflows', help='音频设备输入溢出次数')
+        self.metric_audio_underflows = t.counter('audio_input_underflows', help='音频设备输入欠载次数')
+        t.add_collector(self.collect_counters, kind='counter')
+        t.add_collector(self.collect_gauges)
+        t.add_rate('capture_fps', 'frames_captured')
+        t.add_rate('encoder_fps', 'encoder_frames_written')
+
+    def collect_counters(self):
+        # 在采样线程中调用，录制线程可能随时替换这些对象，每个只读取一次
+        values = {}
+        scheduler, encoder, ring = self.scheduler, self.encoder, self.audio_ring
+        if scheduler is not None:
+            stats = scheduler.stats()
+            values.update(late_frames=stats['late_frames'], scheduler_dropped_frames=stats['dropped_frames'],
+                          duplicated_frames=stats['duplicated_frames'])
+        if encoder is not None:
+            values.update(encoder_frames_written=encoder.frames_written,
+                          encoder_dropped_frames=encoder.dropped_frames,
+                          encoder_skipped_frames=encoder.skipped_frames)
+        if ring is not None:
+            values.update(audio_ring_overflows=ring.overflows, audio_ring_dropped_frames=ring.dropped_frames)
+        return values
+
+    def collect_gauges(self):
+        values = {'audio_level': float(self.audio_level)}
+        encoder, ring = self.encoder, self.audio_ring
+        if encoder is not None:
+            depth = encoder.frames.qsize()
+            values.update(encoder_queue_frames=depth, encoder_lag_seconds=depth / encoder.fps)
+        if ring is not None:
+            values['audio_ring_fill'] = ring.available() / ring.capacity
+        if self.pip_frames:
+            values['camera_pip_max_lag_seconds'] = self.pip_max_lag
+        return values
+
+    def get_metrics(self):
+        """
+        返回最近一次采样的指标：{'values': {...}, 'histograms': {...}}，还没有采样时为空字典。
+        """
+        return self.telemetry.latest
 
     def set_recording_area(self, rect):
-        self.recording_area = rect
+        """
+        设置录制区域，可在录制过程中调用（Ctrl+R），下一帧即生效，不需要重启采集和编码管线。
+        """
+        if rect is None:
+            self.recording_area = None
+            return
+        x, y, w, h = rect.getRect() if hasattr(rect, 'getRect') else rect
+        screen_w, screen_h = self.capture.get_size()
+        x = max(0, min(x, screen_w - 1))
+        y = max(0, min(y, screen_h - 1))
+        w = min(w, screen_w - x)
+        h = min(h, screen_h - y)
+        if w <= 0 or h <= 0:
+            print(f"Ignoring empty recording area: {rect}")
+            return
+        # 以元组整体替换，采集线程每帧只读取一次，不会读到新旧混合的区域
+        self.recording_area = (x, y, w, h)
 
     def record_audio(self, audio_sample_rate, device_index):
         self.start_event.wait()
-        self.recording_start_time = time.perf_counter()
-        with sd.InputStream(samplerate=audio_sample_rate, channels=self.audio_channels, 
-                            dtype=self.audio_dtype, callback=self.audio_callback, 
-                            device=device_index, latency='low'):
-            while self.recording:
-                if not self.is_paused:
-                    sd.sleep(100)
-                else:
-                    self.pause_event.wait()
+        self.audio_ring = AudioRingBuffer(int(audio_sample_rate * self.audio_buffer_seconds), self.audio_channels,
+                                          dtype=self.audio_dtype)
+        audio_name = f'audio.{self.audio_file_format}'
+        self.audio_writer = AudioFileWriter(self.audio_ring, os.path.join(self.session_dir, audio_name),
+                                            audio_sample_rate, gain=self.audio_volume)
+        self.audio_writer.start()
+        self.journal.update(audio_file=audio_name, audio_sample_rate=audio_sample_rate)
+        if self.live_transcription:
+            self.live_transcriber = LiveTranscriber(OpenAITranscriptionService(), audio_sample_rate,
+                                                    self.audio_channels,
+                                                    srt_path=os.path.join(self.session_dir, 'live.srt'))
+            self.live_transcriber.start()
+        journaled_start = False
+        import sounddevice as sd
+        try:
+            with sd.InputStream(samplerate=audio_sample_rate, channels=self.audio_channels,
+                                dtype=self.audio_dtype, callback=self.audio_callback,
+                                device=device_index, latency='low'):
+                while self.recording:
+                    if not journaled_start and self.audio_start_pts is not None:
+                        # 日志在这里而不是实时回调中写入
+                        self.journal.update(audio_start_pts=self.audio_start_pts)
+                        journaled_start = True
+                    if not self.is_paused:
+                        sd.sleep(100)
+                    else:
+                        self.pause_event.wait()
+        finally:
+            self.audio_writer.close()
 
     def audio_callback(self, indata, frames, time_info, status):
+        if status:
+            if status.input_overflow:
+                self.metric_audio_overflows.inc()
+            if status.input_underflow:
+                self.metric_audio_underflows.inc()
         if self.is_paused:
             return
-        current_time = time.perf_counter() - self.recording_start_time - self.total_pause_time
-        self.audio_frames.append((current_time, indata.copy()))
-        self.audio_level = np.max(np.abs(indata))
-        self.last_audio_time = current_time
+        if self.audio_start_pts is None:
+            # 第一块的首个采样早于回调 frames / sample_rate 秒
+            self.audio_start_pts = max(0.0, self.media_clock.now() - frames / self.audio_sample_rate)
+        # 实时回调中只拷贝进预分配的环形缓冲，不分配内存
+        self.audio_ring.write(indata)
+        if self.live_transcriber is not None:
+            self.live_transcriber.feed(indata)
+        self.audio_level = max(indata.max(), -indata.min())
         self.audio_sample_count += frames
+        self.last_audio_time = MediaClock.sample_pts(self.audio_start_pts, self.audio_sample_count, self.audio_sample_rate)
 
     def record_video(self):
-        self.recording_start_time = time.perf_counter()
+        self.load_cursor_position()
+        self.media_clock.start()
         self.start_event.set()
-        next_frame_time = self.recording_start_time
-        while self.recording:
-            if not self.is_paused:
-                current_time = time.perf_counter()
-                if current_time >= next_frame_time:
-                    frame = self.d3d.screenshot()
-                    self.mouse_position = pyautogui.position()  # 获取鼠标位置
-                    if self.recording_area:
-                        x, y, w, h = self.recording_area.getRect()
-                        frame = frame[y:y+h, x:x+w]
-                        self.mouse_position = (self.mouse_position[0] - x, self.mouse_position[1] - y)  # 调整鼠标位置相对于录制区域
-                    
-                    # 在帧上绘制鼠标指针
-                    frame_with_cursor = self.draw_mouse_pointer(frame)
-                    
-                    frame_time = current_time - self.recording_start_time - self.total_pause_time
-                    self.video_frames.put((frame_time, frame_with_cursor))
-                    next_frame_time = self.recording_start_time + (self.frame_count + 1) * self.frame_duration + self.total_pause_time
-                    self.last_frame_time = frame_time
-                    self.frame_count += 1
-                else:
-                    time.sleep(0.001)
-            else:
-                self.pause_event.wait()
+        self.scheduler = CaptureScheduler(self.video_fps, self.capture_frame, self.push_frame,
+                                          missed_frame_policy=self.missed_frame_policy,
+                                          clock=self.media_clock.now)
+        try:
+            self.scheduler.run(lambda: self.recording, lambda: self.is_paused, self.pause_event)
+        except Exception as e:
+            print(f"Recording error: {e}")
+            self.recording = False
+
+    def capture_frame(self):
+        area = self.recording_area
+        started = time.perf_counter()
+        capture = self.capture
+        cursor_position = self.cursor_position if self.cursor_mode != 'none' else None
+        self.mouse_position = None
+        if cursor_position is not None:
+            # 光标位置是虚拟桌面坐标，先换算到采集画面的坐标系（多显示器时采集原点不一定是 (0, 0)）
+            cursor_x, cursor_y = cursor_position()
+            origin_x, origin_y = capture.get_origin()
+            self.mouse_position = (cursor_x - origin_x, cursor_y - origin_y)
+        if area is None:
+            frame = capture.grab()
+        else:
+            # 后端只采集区域内的像素，返回连续数组
+            x, y, w, h = area
+            frame = capture.grab_region(x, y, w, h)
+            if self.mouse_position is not None:
+                self.mouse_position = (self.mouse_position[0] - x, self.mouse_position[1] - y)  # 调整鼠标位置相对于录制区域
+
+        grabbed = time.perf_counter()
+        self.metric_grab.observe(grabbed - started)
+        # 在帧上绘制鼠标指针
+        frame = self.draw_mouse_pointer(frame)
+        self.metric_cursor.observe(time.perf_counter() - grabbed)
+        return frame
+
+    def push_frame(self, frame_time, frame):
+        if self.first_frame_time is None:
+            self.first_frame_time = frame_time
+        self.last_frame_time = frame_time
+        self.frame_count += 1
+        if self.cursor_mode == 'metadata' and self.mouse_position is not None:
+            if self.cursor_writer is None:
+                self.cursor_writer = CursorMetadataWriter(os.path.join(self.temp_dir, 'cursor.jsonl'))
+            self.cursor_writer.write(frame_time, *self.mouse_position)
+        if self.encoder is None:
+            # 录制中直接编码为最终的视频编码格式，按固定时长写成分片，进程中断时已完成的分片不受影响
+            self.encoder = StreamingEncoder(self.session_dir, frame.shape[1], frame.shape[0], self.video_fps,
+                                            profile=self.encoder_profile, container=self.output_format,
+                                            max_queue_frames=self.encoder_queue_frames,
+                                            log_file=os.path.join(self.session_dir, 'encoder.log'),
+                                            segment_seconds=self.segment_seconds)
+            self.encoder.start()
+        if frame.shape[0] != self.encoder.height or frame.shape[1] != self.encoder.width:
+            frame = self.fit_frame(frame, self.encoder.width, self.encoder.height)
+        camera = self.camera  # 界面线程可能随时关闭摄像头，这里只读取一次
+        if self.camera_pip and camera is not None:
+            self.draw_camera(frame, frame_time, camera)
+        self.metric_queue.observe(self.encoder.frames.qsize())
+        self.encoder.write(frame, frame_time)
+        self.metric_frames.inc()
+        self.metric_latency.observe(self.media_clock.now() - frame_time)
+        if self.encoder.start_pts is not None and 'video_start_pts' not in self.journal.data:
+            self.journal.update(video_start_pts=self.encoder.start_pts)
+
+    def fit_frame(self, frame, width, height):
+        # 录制区域中途改变时按比例缩放并居中放入编码器尺寸，两侧留黑边
+        scale = min(width / frame.shape[1], height / frame.shape[0])
+        new_w = max(1, min(width, int(round(frame.shape[1] * scale))))
+        new_h = max(1, min(height, int(round(frame.shape[0] * scale))))
+        canvas = np.zeros((height, width, 3), dtype=np.uint8)
+        x0 = (width - new_w) // 2
+        y0 = (height - new_h) // 2
+        cv2.resize(frame, (new_w, new_h), dst=canvas[y0:y0+new_h, x0:x0+new_w], interpolation=cv2.INTER_AREA)
+        return canvas
 
     def draw_mouse_pointer(self, frame):
-        # 创建一个帧的副本，以便在上面绘制而不影响原始帧
-        frame_with_cursor = frame.copy()
-        x, y = self.mouse_position
-        if 0 <= x < frame.shape[1] and 0 <= y < frame.shape[0]:
-            # 绘制一个更明显的鼠标指针
-            cv2.circle(frame_with_cursor, (int(x), int(y)), 10, (0, 255, 0), 2)  # 绿色圆圈
-            cv2.line(frame_with_cursor, (int(x), int(y)), (int(x), int(y) - 10), (0, 255, 0), 2)  # 上
-            cv2.line(frame_with_cursor, (int(x), int(y)), (int(x), int(y) + 10), (0, 255, 0), 2)  # 下
-            cv2.line(frame_with_cursor, (int(x), int(y)), (int(x) - 10, int(y)), (0, 255, 0), 2)  # 左
-            cv2.line(frame_with_cursor, (int(x), int(y)), (int(x) + 10, int(y)), (0, 255, 0), 2)  # 右
-        return frame_with_cursor
+        # 在采集到的帧上原地混合光标精灵，只触及指针下方的小块区域
+        if self.cursor_mode == 'overlay' and self.mouse_position is not None:
+            x, y = self.mouse_position
+            self.cursor_overlay.draw(frame, int(x), int(y), self.cursor_scale)
+        return frame
+
+    def draw_camera(self, frame, frame_time, camera):
+        # 画中画使用摄像头最新一帧，记录它相对屏幕帧的延迟（两者都换算到媒体时钟）
+        started = time.perf_counter()
+        camera_pts = self.pip.draw(frame, camera)
+        self.metric_pip.observe(time.perf_counter() - started)
+        if camera_pts is not None:
+            self.pip_frames += 1
+            self.pip_max_lag = max(self.pip_max_lag, frame_time - self.media_clock.to_media(camera_pts))
 
     def start_camera(self):
+        # 摄像头在自己的线程中打开和读取，这里立即返回
         if self.camera is None:
-            self.camera = cv2.VideoCapture(0)
+            self.camera = CameraCapture(self.camera_source, clock=self.media_clock.clock).start()
         self.camera_enabled = True
 
     def stop_camera(self):
         if self.camera is not None:
-            self.camera.release()
+            self.camera.stop()
             self.camera = None
         self.camera_enabled = False
+        self.camera_sequence = 0
 
     def get_camera_frame(self):
+        """
+        返回摄像头的最新一帧（拷贝进预分配的预览缓冲），没有新帧时返回 None，不会阻塞。
+        """
         if self.camera_enabled and self.camera:
-            ret, frame = self.camera.read()
-            if ret:
-                self.camera_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                return self.camera_frame
+            frame, _, sequence = self.camera.latest(self.camera_frame)
+            if frame is not None and sequence != self.camera_sequence:
+                self.camera_frame = frame
+                self.camera_sequence = sequence
+                return frame
         return None
 
-    def record_screen(self, output_file, record_audio=True, output_format='mp4', device_index=None, volume=1.0):
+    def record_screen(self, output_file, record_audio=True, output_format='mp4', device_index=None, volume=1.0,
+                      encoder_profile=None):
+        # 先校验格式和编码配置，避免录制结束后才发现无法封装
+        get_container(output_format)
+        # 采集后端不可用时在这里抛出，录制直接失败，而不是在录制线程中静默结束
+        self.capture
+        self.metrics_file = None
+        if self.metrics_format:
+            if self.metrics_format not in METRICS_FORMATS:
+                raise ValueError(f"未知的指标格式: {self.metrics_format}，可选: {', '.join(METRICS_FORMATS)}")
+            self.metrics_file = f"{os.path.splitext(output_file)[0]}{METRICS_FORMATS[self.metrics_format]}"
+        if encoder_profile:
+            self.encoder_profile = get_profile(encoder_profile).name
         self.recording = True
         self.is_paused = False
         self.pause_event.set()
         self.start_event.clear()
+        self.output_format = output_format
+        self.audio_volume = volume
+        self.session_dir = create_session_dir(output_file)
+        self.journal = SessionJournal(self.session_dir)
+        self.journal.update(output_file=os.path.abspath(output_file), output_format=output_format,
+                            encoder_profile=self.encoder_profile, video_fps=self.video_fps,
+                            segment_seconds=self.segment_seconds, started_at=time.time())
+        self.telemetry.start(self.metrics_file, self.metrics_format or 'jsonl', self.metrics_interval)
 
         if record_audio:
             self.audio_thread = threading.Thread(target=self.record_audio, args=(self.audio_sample_rate, device_index))
@@ -146,123 +412,174 @@ class ScreenRecorder:
         self.video_thread.start()
 
         try:
-            self.recording_start_time = time.perf_counter()
-            next_frame_time = self.recording_start_time
-            while self.recording:
-                if not self.is_paused:
-                    current_time = time.perf_counter()
-                    if current_time >= next_frame_time:
-                        frame = self.d3d.screenshot()
-                        if self.recording_area:
-                            x, y, w, h = self.recording_area.getRect()
-                            frame = frame[y:y+h, x:x+w]
-
-                        frame_time = current_time - self.recording_start_time - self.total_pause_time
-                        self.video_frames.put((frame_time, frame))
-                        next_frame_time = self.recording_start_time + (self.frame_count + 1) * self.frame_duration + self.total_pause_time
-                        self.last_frame_time = frame_time
-                        self.frame_count += 1
-                    else:
-                        time.sleep(0.001)
-                else:
-                    self.pause_event.wait()
+            # 采集只在 video_thread 中进行，这里等待录制结束
+            self.video_thread.join()
         except Exception as e:
             print(f"Recording error: {e}")
         finally:
             self.stop_recording()
+            if self.audio_thread:
+                self.audio_thread.join()
             self.process_recorded_data(output_file, output_format, volume)
 
-    def check_sync(self):
-        if len(self.sync_buffer) > 30:  # 减少检查间隔
-            audio_times = [t for type, t in self.sync_buffer if type == 'audio']
-            video_times = [t for type, t in self.sync_buffer if type == 'video']
-            if audio_times and video_times:
-                sync_diff = np.mean(audio_times) - np.mean(video_times)
-                if abs(sync_diff) > 0.05:  # 如果音视频差异超过50ms
-                    print(f"Sync adjustment needed: {sync_diff:.3f}s")
-                    self.adjust_sync(sync_diff)
-        self.sync_buffer.clear()  # 清空缓冲区，避免旧数据影响
-
-    def adjust_sync(self, sync_diff):
-        # 调整视频时间戳
-        adjusted_video_frames = Queue()
-        while not self.video_frames.empty():
-            timestamp, frame = self.video_frames.get()
-            adjusted_video_frames.put((timestamp + sync_diff, frame))
-        self.video_frames = adjusted_video_frames
-        self.last_frame_time += sync_diff
-
     def process_recorded_data(self, output_file, output_format, volume):
-        temp_video = os.path.join(self.temp_dir, f'temp_video.{output_format}')
-        temp_audio = os.path.join(self.temp_dir, 'temp_audio.wav')
-
-        # 处理视频帧
-        fourcc = cv2.VideoWriter_fourcc(*self.get_fourcc(output_format))
-        out = None
-        frame_times = []
-        while not self.video_frames.empty():
-            timestamp, frame = self.video_frames.get()
-            frame_times.append(timestamp)
-            if out is None:
-                out = cv2.VideoWriter(temp_video, fourcc, self.video_fps, (frame.shape[1], frame.shape[0]))
-            out.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
-        
-        if out:
-            out.release()
-        
+        video_start_pts = self.first_frame_time or 0.0
+
+        # 帧已在录制过程中写入编码器，这里只需等待编码器收尾
+        temp_video = None
+        if self.encoder is not None:
+            temp_video = self.encoder.close()
+        # 编码器收尾后再停止采样，最后一次快照包含全部写入的帧
+        self.print_metrics(self.telemetry.stop())
+        if self.encoder is not None:
+            if self.encoder.dropped_frames:
+                print(f"Encoder dropped frames: {self.encoder.dropped_frames}")
+            video_start_pts = self.encoder.start_pts
+            self.encoder = None
+
+        if self.scheduler is not None:
+            print(f"Capture scheduler: {self.scheduler.stats()}")
+        if self.pip_frames:
+            print(f"Camera PiP: {self.pip_frames} frames, max lag {self.pip_max_lag * 1000:.1f} ms")
+            self.pip_frames = 0
+            self.pip_max_lag = 0.0
+
+        if self.cursor_writer is not None:
+            cursor_file = f"{os.path.splitext(output_file)[0]}.cursor.jsonl"
+            shutil.move(self.cursor_writer.close(), cursor_file)
+            self.cursor_writer = None
+            print(f"Cursor metadata: {cursor_file}")
+
         # 计算实际帧率
-        if len(frame_times) > 1:
-            actual_fps = (len(frame_times) - 1) / (frame_times[-1] - frame_times[0])
+        if self.frame_count > 1 and self.last_frame_time > self.first_frame_time:
+            actual_fps = (self.frame_count - 1) / (self.last_frame_time - self.first_frame_time)
             print(f"Actual video FPS: {actual_fps:.2f}")
             print(f"Total frames: {self.frame_count}")
-            print(f"Total video duration: {frame_times[-1]:.3f} seconds")
-
-        # 处理音频帧
-        if self.audio_frames:
-            audio_data = np.concatenate([frame for _, frame in self.audio_frames], axis=0)
-            audio_data = np.clip(audio_data * volume, -1, 1)
-            
-            print(f"Total audio samples: {self.audio_sample_count}")
-            print(f"Total audio duration: {self.audio_sample_count / self.audio_sample_rate:.3f} seconds")
-            
-            sf.write(temp_audio, audio_data, self.audio_sample_rate)
-
-            # 使用 FFmpeg 合并音视频
-            self.merge_audio_video(temp_video, temp_audio, output_file, output_format)
+            print(f"Total video duration: {self.last_frame_time:.3f} seconds")
+
+        # 音频已在录制过程中由写盘线程流式写入文件
+        temp_audio = None
+        audio_offset = 0.0
+        if self.audio_writer is not None and self.audio_writer.frames_written > 0:
+            temp_audio = self.audio_writer.path
+            print(f"Total audio samples: {self.audio_writer.frames_written}")
+            print(f"Total audio duration: {self.audio_writer.frames_written / self.audio_sample_rate:.3f} seconds")
+            if self.audio_ring.overflows:
+                print(f"Audio ring buffer overflows: {self.audio_ring.overflows} ({self.audio_ring.dropped_frames} frames dropped)")
+            # 音频相对视频的起始偏移由媒体时钟给出
+            audio_offset = self.audio_start_pts - video_start_pts
+            print(f"Audio offset: {audio_offset:.3f} seconds")
+
+        live_transcriber, self.live_transcriber = self.live_transcriber, None
+        job = None
+        if temp_video is None:
+            print("No video frames were captured")
+            if live_transcriber is not None:
+                live_transcriber.cancel()
         else:
-            os.rename(temp_video, output_file)
+            # 编码和字幕设置在这里读取，导出排队期间开始的新录制不会影响它
+            duration = self.last_frame_time - video_start_pts + self.frame_duration if self.frame_count else None
+            pipeline, subtitled_output = self.build_pipeline(temp_video, temp_audio, output_file, output_format,
+                                                             audio_offset, duration)
+            job = ExportJob(os.path.basename(output_file),
+                            lambda job: self.export_recording(job, pipeline, subtitled_output, live_transcriber,
+                                                              audio_offset))
+            job.session_dir = self.session_dir
+        self.session_dir = None
+        self.journal = None
+        self.audio_writer = None
+        self.audio_ring = None
 
         # 重置计数器和时间戳
         self.frame_count = 0
         self.audio_sample_count = 0
         self.last_frame_time = 0
         self.last_audio_time = 0
-        self.total_pause_time = 0
-        self.recording_start_time = None
+        self.audio_start_pts = None
+        self.media_clock.reset()
+        self.first_frame_time = None
+
+        if job is not None:
+            if self.defer_export:
+                self.export_job = job
+            else:
+                job.run()
+                self.apply_export_result(job)
+        return job
+
+    def export_recording(self, job, pipeline, subtitled_output, live_transcriber, audio_offset):
+        """
+        导出任务：等待实时转录收尾，执行后处理管线，主文件生成后只删除 job.session_dir 这一个会话目录。
+        失败或取消时保留分片以便恢复。返回管线结果，另含 subtitled_output。
+        """
+        session_dir = job.session_dir
+        try:
+            transcript = None
+            if live_transcriber is not None:
+                job.update(0.0, "等待实时转录完成")
+                transcript = self.finish_live_transcription(live_transcriber, audio_offset)
+            if transcript is not None and pipeline.audio_file:
+                base = os.path.splitext(pipeline.outputs[0]['path'])[0]
+                pipeline.set_subtitles(pipeline.srt_file or f"{base}.srt", transcript=transcript)
+            results = pipeline.run(job)
+        except BaseException:
+            if live_transcriber is not None:
+                live_transcriber.cancel()
+            print(f"录制分片保留在 {session_dir}，可运行 python segments.py \"{session_dir}\" 恢复")
+            raise
+        results['subtitled_output'] = subtitled_output if subtitled_output in results['outputs'] else None
+        shutil.rmtree(session_dir, ignore_errors=True)
+        return results
+
+    def apply_export_result(self, job):
+        # 同步导出时把结果保存到录制器属性上，与之前的接口保持一致
+        if job.status == 'done':
+            self.subtitle_file = job.result['srt_file']
+            self.subtitled_output = job.result['subtitled_output']
+            self.subtitle_error = next(iter(job.result['errors'].values()), None)
+        elif job.error is not None:
+            print(f"Error during merge: {job.error}")
+
+    def finish_live_transcription(self, live_transcriber, audio_offset):
+        """
+        等待实时转录的尾部完成，失败时返回 None，由后处理管线从录制的音频重新完整转录。
+        """
+        try:
+            transcript = live_transcriber.finish(audio_offset)
+        except Exception as e:
+            print(f"实时转录失败，将重新转录: {e}")
+            return None
+        return transcript if transcript.get('segments') else None
 
     def toggle_pause(self):
+        # 暂停/恢复只修改媒体时钟的偏移量，已缓冲和已编码的帧不受影响
         if self.is_paused:
             # 继续录制
-            pause_duration = time.perf_counter() - self.pause_start_time
-            self.total_pause_time += pause_duration
+            pause_duration = self.media_clock.resume()
             self.is_paused = False
             self.pause_event.set()
             print(f"继续录制，暂停时长: {pause_duration:.3f}秒")
         else:
             # 暂停录制
-            self.pause_start_time = time.perf_counter()
+            self.media_clock.pause()
             self.is_paused = True
             self.pause_event.clear()
             print("暂停录制")
 
-        self.adjust_sync_after_pause()
-
-    def adjust_sync_after_pause(self):
-        if self.last_frame_time > 0 and self.last_audio_time > 0:
-            sync_diff = self.last_audio_time - self.last_frame_time
-            if abs(sync_diff) > 0.05:  # 如果差异超过50ms
-                print(f"暂停后同步调整: {sync_diff:.3f}秒")
-                self.adjust_sync(sync_diff)
+    def print_metrics(self, snapshot):
+        if not snapshot:
+            return
+        for name, summary in snapshot['histograms'].items():
+            if summary['count']:
+                scale, unit = (1000, 'ms') if name.endswith('_seconds') else (1, '')
+                print(f"{name}: p50 {summary['p50'] * scale:.2f}{unit}, p95 {summary['p95'] * scale:.2f}{unit}, "
+                      f"max {summary['max'] * scale:.2f}{unit} ({summary['count']} samples)")
+        values = snapshot['values']
+        if values.get('audio_input_overflows') or values.get('audio_input_underflows'):
+            print(f"Audio device xruns: {values['audio_input_overflows']} overflows, "
+                  f"{values['audio_input_underflows']} underflows")
+        if self.metrics_file:
+            print(f"Metrics: {self.metrics_file}")
 
     def stop_recording(self):
         self.recording = False
@@ -283,30 +600,47 @@ class ScreenRecorder:
             finally:
                 self.temp_dir = None
 
-    def get_fourcc(self, format):
-        fourcc_dict = {
-            'mp4': 'mp4v',
-            'avi': 'XVID',
-            'mov': 'MJPG'
-        }
-        return fourcc_dict.get(format, 'mp4v')
-
-    def merge_audio_video(self, video_file, audio_file, output_file, output_format):
+    def build_pipeline(self, video_file, audio_file, output_file, output_format, audio_offset=0.0, duration=None):
+        """
+        按当前的编码和字幕设置规划后处理，返回 (管线, 带字幕的输出路径或 None)。
+        subtitle_mode 设置时同时生成 <name>.srt 和带字幕的 <name>_with_subtitles 版本。
+        """
+        pipeline = PostProcessPipeline(video_file, audio_file, audio_offset, self.encoder_profile, duration=duration)
+        pipeline.add_output(output_file, output_format, export_profile=self.export_profile,
+                            export_workers=self.export_workers)
+        subtitled_output = None
+        base = os.path.splitext(output_file)[0]
+        if audio_file and self.subtitle_mode:
+            pipeline.set_subtitles(f"{base}.srt")
+            burn_in = self.subtitle_mode == 'burn'
+            subtitled_format = output_format
+            if not burn_in and get_container(output_format)['subtitle'] is None:
+                subtitled_format = 'mkv'  # 容器不支持字幕流时改用 mkv
+            subtitled_output = f"{base}_with_subtitles.{subtitled_format}"
+            pipeline.add_output(subtitled_output, subtitled_format, subtitles=True, burn_in=burn_in)
+        return pipeline, subtitled_output
+
+    def merge_audio_video(self, video_file, audio_file, output_file, output_format, audio_offset=0.0,
+                          transcript=None):
+        """
+        同步生成最终文件和字幕产物。字幕失败不影响主文件，错误保存在 subtitle_error 中。
+        """
+        pipeline, subtitled_output = self.build_pipeline(video_file, audio_file, output_file, output_format,
+                                                         audio_offset)
+        if transcript is not None and audio_file:
+            pipeline.set_subtitles(pipeline.srt_file or f"{os.path.splitext(output_file)[0]}.srt",
+                                   transcript=transcript)
         try:
-            video = ffmpeg.input(video_file)
-            audio = ffmpeg.input(audio_file)
-            out = ffmpeg.output(video, audio, output_file, 
-                                vcodec='libx264', 
-                                acodec='aac', 
-                                video_bitrate='5000k', 
-                                audio_bitrate='192k', 
-                                r=self.video_fps, 
-                                strict='experimental',
-                                vsync='cfr')
-            out = out.overwrite_output()
-            ffmpeg.run(out, capture_stdout=True, capture_stderr=True)
+            results = pipeline.run()
+            self.subtitle_file = results['srt_file']
+            self.subtitled_output = subtitled_output if subtitled_output in results['outputs'] else None
+            self.subtitle_error = next(iter(results['errors'].values()), None)
+            return output_file in results['outputs']
+        except ffmpeg.Error as e:
+            print(f"Error during merge: {e.stderr.decode('utf8', errors='replace') if e.stderr else e}")
         except Exception as e:
             print(f"Error during merge: {str(e)}")
+        return False
 
     def reset(self):
         self.recording = False
@@ -315,16 +649,35 @@ class ScreenRecorder:
         if self.audio_thread:
             self.audio_thread.join()
         self.audio_thread = None
+        if self.encoder is not None:
+            try:
+                self.encoder.close()
+            except RuntimeError as e:
+                print(f"Encoder error during reset: {e}")
+            self.encoder = None
+        self.telemetry.stop()
+        if self.cursor_writer is not None:
+            self.cursor_writer.close()
+            self.cursor_writer = None
+        if self.live_transcriber is not None:
+            self.live_transcriber.cancel()
+            self.live_transcriber = None
+        self.subtitle_file = None
+        self.subtitled_output = None
+        self.subtitle_error = None
         if self.temp_dir:
             self.cleanup()
         self.temp_dir = tempfile.mkdtemp()
         self.pause_event.set()
         self.start_time = None
-        self.pause_start_time = None
-        self.total_pause_time = 0
-        self.audio_frames = []
+        self.media_clock.reset()
+        self.audio_start_pts = None
+        self.audio_writer = None
+        self.audio_ring = None
+        self.first_frame_time = None
 
     def test_audio(self, device_index):
+        import sounddevice as sd
         self.test_audio_running = True
         with sd.InputStream(device=device_index, channels=self.audio_channels, 
                             samplerate=self.audio_sample_rate, callback=self.test_audio_callback):
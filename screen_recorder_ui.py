@@ -5,32 +5,21 @@ import time
 import os
 import threading
 import math
-import sounddevice as sd
-import subprocess
-import tempfile
-import shutil
-import shlex
-from PyQt5.QtWidgets import (QApplication, QWidget, QPushButton, QVBoxLayout, QHBoxLayout, 
-                             QLabel, QFileDialog, QProgressBar, QComboBox, QStyleFactory, 
-                             QFrame, QSizePolicy, QSlider, QRubberBand, QShortcut, QCheckBox, QMessageBox)
-from PyQt5.QtCore import Qt, QPoint, QTimer, pyqtSignal, QSize, QPropertyAnimation, QEasingCurve, QRect, QEvent
-from PyQt5.QtGui import QIcon, QFont, QColor, QPalette, QPainter, QPixmap, QPen, QKeySequence, QImage
+from PyQt5.QtWidgets import (QApplication, QWidget, QPushButton, QVBoxLayout, QHBoxLayout,
+                             QLabel, QFileDialog, QProgressBar, QComboBox, QStyleFactory,
+                             QSlider, QRubberBand, QShortcut, QCheckBox, QMessageBox)
+from PyQt5.QtCore import Qt, QPoint, QTimer, pyqtSignal, QSize, QRect
+from PyQt5.QtGui import QFont, QColor, QPainter, QPixmap, QPen, QKeySequence, QImage
 from PyQt5.QtSvg import QSvgRenderer
 from record import ScreenRecorder
-from openai_server import OpenAITranscriptionService, process_video_with_subtitles
-from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip
-from moviepy.video.tools.subtitles import SubtitlesClip
-import pysrt
-from moviepy.config import change_settings
-import ffmpeg
+from encoder_profiles import CONTAINERS, ENCODER_PROFILES, DEFAULT_PROFILE
+from postprocess import PostProcessPipeline, process_video_with_subtitles
+from warmup import Warmup, list_audio_devices, preload_modules, probe_ffmpeg
+from export_jobs import ExportJob, ExportQueue, RUNNING, DONE, CANCELLED, FINISHED
 
 # 设置日志记录
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# 设置 ImageMagick 的路径
-imagemagick_path = r"C:\Program Files\ImageMagick-7.1.1-Q16-HDRI\magick.exe"  # 根您的安装路径调整
-change_settings({"IMAGEMAGICK_BINARY": imagemagick_path})
-
 def exception_hook(exctype, value, tb):
     error_msg = ''.join(traceback.format_exception(exctype, value, tb))
     print("An error occurred:")
@@ -113,6 +102,8 @@ class RecordingIcon(QWidget):
         self.audio_level = 0
         self.is_paused = False
         self.is_stopping = False
+        self.metrics_text = ''
+        self.metrics_warning = False
         self.drag_position = None
         self.hover_start_time = None
         self.show_tooltip = False
@@ -162,6 +153,11 @@ class RecordingIcon(QWidget):
             painter.setFont(QFont('Arial', 8))
             painter.setPen(Qt.white)
             painter.drawText(0, 0, 100, 100, Qt.AlignCenter, "单击暂停\n双击停止")
+        elif self.metrics_text:
+            # 实时帧率，最近一次采样期间出现丢帧或音频溢出时显示为橙色
+            painter.setFont(QFont('Arial', 7))
+            painter.setPen(QColor(255, 165, 0) if self.metrics_warning else Qt.white)
+            painter.drawText(0, 68, 100, 16, Qt.AlignCenter, self.metrics_text)
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
@@ -213,6 +209,12 @@ class RecordingIcon(QWidget):
         self.audio_level = level
         self.update()
 
+    def set_metrics(self, text, details='', warning=False):
+        self.metrics_text = text
+        self.metrics_warning = warning
+        self.setToolTip(details)
+        self.update()
+
 class AreaSelectionWidget(QWidget):
     area_selected = pyqtSignal(QRect)
 
@@ -326,18 +328,39 @@ class CameraPreviewWindow(QWidget):
 class ScreenRecorderUI(QWidget):
     recording_stopped = pyqtSignal()
     recording_failed = pyqtSignal(str)
+    warmup_done = pyqtSignal(str)
+    export_updated = pyqtSignal(object)
+    export_submitted = pyqtSignal(object, object)
 
     def __init__(self):
         super().__init__()
         self.initUI()
-        self.check_ffmpeg()
         self.recorder = ScreenRecorder()
+        # 停止录制后只做收尾，封装、转录和字幕在后台导出队列中执行，界面不被阻塞
+        self.recorder.defer_export = True
+        self.export_updated.connect(self.on_export_updated)
+        # 录制线程提交的导出任务经排队信号交给主线程登记，和随后的 recording_stopped 保持先后顺序
+        self.export_submitted.connect(self.queue_export, Qt.QueuedConnection)
+        self.export_queue = ExportQueue(on_update=self.export_updated.emit)
+        self.export_handlers = {}
+        self.current_export = None
+        # 设备枚举、ffmpeg 检查、采集后端创建和重模块导入都在后台完成，窗口立即显示
+        self.warmup_done.connect(self.on_warmup_done)
+        self.warmup = Warmup(on_done=self.warmup_done.emit)
+        self.warmup.add('audio_devices', list_audio_devices)
+        self.warmup.add('ffmpeg', probe_ffmpeg)
+        self.warmup.add('capture', self.recorder.warm_up)
+        self.warmup.add('modules', preload_modules, 'scipy.signal')
+        self.warmup.start()
         self.recording_thread = None
         self.audio_level_timer = QTimer(self)
         self.audio_level_timer.timeout.connect(self.update_audio_level)
         self.recording_time = 0
         self.recording_timer = QTimer(self)
         self.recording_timer.timeout.connect(self.update_recording_time)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(self.update_metrics)
+        self.metrics_totals = (0, 0)
 
         self.recording_stopped.connect(self.on_recording_stopped)
         self.recording_failed.connect(self.on_recording_failed)
@@ -408,7 +431,7 @@ class ScreenRecorderUI(QWidget):
 
         # 添加音频设备选择
         self.audio_device_combo = ModernComboBox(self)
-        self.audio_device_combo.addItems([d['name'] for d in sd.query_devices()])
+        self.audio_device_combo.setEnabled(False)  # 后台枚举完设备后填充
         layout.addWidget(QLabel('Select Audio Device:'))
         layout.addWidget(self.audio_device_combo)
 
@@ -421,10 +444,32 @@ class ScreenRecorderUI(QWidget):
         self.status_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(self.status_label)
 
+        # 后台导出进度，没有导出任务时隐藏
+        self.export_label = QLabel('', self)
+        self.export_label.setAlignment(Qt.AlignCenter)
+        self.export_label.hide()
+        layout.addWidget(self.export_label)
+        export_layout = QHBoxLayout()
+        self.export_progress_bar = QProgressBar(self)
+        self.export_progress_bar.setRange(0, 1000)
+        self.export_progress_bar.setTextVisible(False)
+        self.export_progress_bar.hide()
+        export_layout.addWidget(self.export_progress_bar)
+        self.cancel_export_btn = ModernButton('取消导出', self)
+        self.cancel_export_btn.clicked.connect(self.cancel_export)
+        self.cancel_export_btn.hide()
+        export_layout.addWidget(self.cancel_export_btn)
+        layout.addLayout(export_layout)
+
         self.time_label = QLabel('Recording Time: 00:00:00', self)
         self.time_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(self.time_label)
 
+        self.metrics_label = QLabel('', self)
+        self.metrics_label.setAlignment(Qt.AlignCenter)
+        self.metrics_label.setWordWrap(True)
+        layout.addWidget(self.metrics_label)
+
         btn_layout = QHBoxLayout()
         self.start_btn = ModernButton('Start Recording', self)
         self.start_btn.clicked.connect(self.start_recording)
@@ -459,9 +504,17 @@ class ScreenRecorderUI(QWidget):
         layout.addWidget(self.audio_level_bar)
 
         self.format_combo = ModernComboBox(self)
-        self.format_combo.addItems(['mp4', 'avi', 'mov'])
+        self.format_combo.addItems(list(CONTAINERS))
         layout.addWidget(self.format_combo)
 
+        # 添加编码配置选择
+        self.profile_combo = ModernComboBox(self)
+        for name, profile in ENCODER_PROFILES.items():
+            self.profile_combo.addItem(profile.label, name)
+        self.profile_combo.setCurrentIndex(self.profile_combo.findData(DEFAULT_PROFILE))
+        layout.addWidget(QLabel('编码配置:'))
+        layout.addWidget(self.profile_combo)
+
         self.volume_slider = QSlider(Qt.Horizontal)
         self.volume_slider.setRange(0, 200)
         self.volume_slider.setValue(100)
@@ -475,6 +528,15 @@ class ScreenRecorderUI(QWidget):
         self.subtitle_checkbox.stateChanged.connect(self.toggle_subtitle)
         layout.addWidget(self.subtitle_checkbox)
 
+        # 录制过程中实时转录，停止后字幕几乎立即可用（需先启用字幕）
+        self.live_subtitle_checkbox = QCheckBox('实时字幕', self)
+        self.live_subtitle_checkbox.setEnabled(False)
+        layout.addWidget(self.live_subtitle_checkbox)
+
+        # 默认把字幕作为字幕流封装（秒级完成）；勾选后烧录进画面，需要重新编码整段视频
+        self.burn_in_checkbox = QCheckBox('烧录字幕到画面', self)
+        layout.addWidget(self.burn_in_checkbox)
+
         # 添加重新识别按钮
         self.rerecognize_btn = ModernButton('重新识别', self)
         self.rerecognize_btn.clicked.connect(self.rerecognize_audio)
@@ -504,21 +566,40 @@ class ScreenRecorderUI(QWidget):
         self.camera_checkbox.stateChanged.connect(self.toggle_camera)
         layout.addWidget(self.camera_checkbox)
 
+        # 把摄像头画面合成进录制的视频（画中画），录制时不再显示预览窗口，避免被屏幕采集重复录入
+        self.pip_checkbox = QCheckBox('摄像头画中画录入视频', self)
+        layout.addWidget(self.pip_checkbox)
+
+        # 把录制过程中的帧率、丢帧、队列深度等指标逐秒写入输出文件旁的 .metrics.jsonl
+        self.metrics_checkbox = QCheckBox('保存性能指标', self)
+        layout.addWidget(self.metrics_checkbox)
+
         self.setLayout(layout)
 
-    def check_ffmpeg(self):
-        try:
-            subprocess.run(['ffmpeg', '-version'], check=True, capture_output=True, text=True)
-            print("FFmpeg 可用")
-        except subprocess.CalledProcessError as e:
-            print(f"FFmpeg 不可用: {e}")
-            QMessageBox.critical(self, "错误", "FFmpeg 不可用。请确保 FFmpeg 安装并添加到系统路径中。")
-        except FileNotFoundError:
-            print("FFmpeg 未找到")
-            QMessageBox.critical(self, "错误", "FFmpeg 未到。请确保 FFmpeg 已安装并添加到系统路径中。")
+    def on_warmup_done(self, name):
+        # 预热任务完成时在主线程中调用
+        error = self.warmup.errors.get(name)
+        logging.info(f"Warmup {name}: {self.warmup.timings[name] * 1000:.0f} ms{f' ({error})' if error else ''}")
+        if name == 'audio_devices':
+            if error is not None:
+                self.status_label.setText(f'无法枚举音频设备: {error}')
+                return
+            self.audio_device_combo.addItems([d['name'] for d in self.warmup.results[name]])
+            self.audio_device_combo.setEnabled(True)
+        elif name == 'ffmpeg':
+            if error is not None:
+                print(error)
+                QMessageBox.critical(self, "错误", str(error))
+            else:
+                print(f"FFmpeg 可用: {self.warmup.results[name]}")
+        elif name == 'capture' and error is not None:
+            self.status_label.setText(f'无法采集屏幕: {error}')
 
     def test_audio(self):
         device_index = self.audio_device_combo.currentIndex()
+        if device_index < 0:
+            self.status_label.setText('音频设备尚未就绪')
+            return
         self.test_audio_thread = threading.Thread(target=self.recorder.test_audio, args=(device_index,))
         self.test_audio_thread.start()
         self.audio_level_timer.start(100)
@@ -548,7 +629,7 @@ class ScreenRecorderUI(QWidget):
             self.status_label.setText('Recording screen and audio...')
             
             device_index = self.audio_device_combo.currentIndex()
-            device_info = sd.query_devices()
+            device_info = list_audio_devices()
             if device_index >= 0 and device_index < len(device_info):
                 device = device_info[device_index]
                 print(f"Selected audio device: {device['name']}")
@@ -558,6 +639,13 @@ class ScreenRecorderUI(QWidget):
                     self.recorder.reset()  # 确保在开始新录制前重置录制器
                     self.recorder.video_fps = fps  # 设置选择的帧率
                     self.recorder.frame_duration = 1 / fps
+                    self.recorder.encoder_profile = self.profile_combo.currentData()
+                    self.recorder.live_transcription = (self.subtitle_enabled
+                                                        and self.live_subtitle_checkbox.isChecked())
+                    self.recorder.subtitle_mode = (('burn' if self.burn_in_checkbox.isChecked() else 'soft')
+                                                   if self.subtitle_enabled else None)
+                    self.recorder.camera_pip = self.camera_checkbox.isChecked() and self.pip_checkbox.isChecked()
+                    self.recorder.metrics_format = 'jsonl' if self.metrics_checkbox.isChecked() else None
                     self.recording_thread = threading.Thread(target=self.record_with_error_handling, 
                                                              args=(output_file, output_format, device_index, volume))
                     self.recording_thread.start()
@@ -565,6 +653,8 @@ class ScreenRecorderUI(QWidget):
                     self.audio_level_timer.start(100)
                     self.recording_time = 0
                     self.recording_timer.start(1000)
+                    self.metrics_totals = (0, 0)
+                    self.metrics_timer.start(1000)
                     
                     # 显示录制图标
                     screen_geometry = QApplication.desktop().screenGeometry()
@@ -584,9 +674,13 @@ class ScreenRecorderUI(QWidget):
 
             if self.camera_checkbox.isChecked():
                 self.recorder.start_camera()
-                self.camera_preview_window.show()
-                self.camera_preview_window.move_to_bottom_right()
-                self.camera_timer.start(33)
+                if self.recorder.camera_pip:
+                    self.camera_preview_window.hide()
+                    self.camera_timer.stop()
+                else:
+                    self.camera_preview_window.show()
+                    self.camera_preview_window.move_to_bottom_right()
+                    self.camera_timer.start(33)
 
     def record_with_error_handling(self, output_file, output_format, device_index, volume):
         try:
@@ -594,6 +688,10 @@ class ScreenRecorderUI(QWidget):
             logging.info(f"Audio device index: {device_index}")
             logging.info(f"Audio volume: {volume}")
             self.recorder.record_screen(output_file, True, output_format, device_index, volume)
+            job, self.recorder.export_job = self.recorder.export_job, None
+            if job is not None:
+                subtitles = self.recorder.subtitle_mode is not None
+                self.submit_export(job, lambda job: self.export_video(job, output_file, subtitles))
         except Exception as e:
             logging.error(f"Error during recording: {e}", exc_info=True)
             self.recording_failed.emit(f'Recording failed: {str(e)}')
@@ -610,14 +708,20 @@ class ScreenRecorderUI(QWidget):
     def reset_recording_state(self):
         self.start_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
-        self.status_label.setText('Ready to record')
+        if self.export_queue.pending():
+            # 导出仍在排队或进行中，保留导出状态，由导出完成的回调更新提示
+            self.status_label.setText('录制已停止，正在后台导出...')
+        else:
+            self.status_label.setText('Ready to record')
         self.recording_icon.hide()
 
         self.audio_level_timer.stop()
         self.recording_timer.stop()
+        self.metrics_timer.stop()
         self.audio_level_bar.setValue(-60)
         self.audio_level_label.setText('Audio Level: -60 dB')
         self.time_label.setText('Recording Time: 00:00:00')
+        self.recording_icon.set_metrics('')
 
         self.recording_time = 0
         self.recorder.reset()
@@ -630,8 +734,10 @@ class ScreenRecorderUI(QWidget):
         self.recording_icon.hide()
         self.audio_level_timer.stop()
         self.recording_timer.stop()
+        self.metrics_timer.stop()
         self.audio_level_bar.setValue(-60)
         self.audio_level_label.setText('Audio Level: -60 dB')
+        self.recording_icon.set_metrics('')
 
     def update_audio_level(self):
         level = self.recorder.get_audio_level()
@@ -652,6 +758,25 @@ class ScreenRecorderUI(QWidget):
         seconds = self.recording_time % 60
         self.time_label.setText(f'Recording Time: {hours:02d}:{minutes:02d}:{seconds:02d}')
 
+    def update_metrics(self):
+        # 读取录制器最近一次采样的指标（采样线程整体替换快照，这里不需要加锁）
+        metrics = self.recorder.get_metrics()
+        if not metrics:
+            return
+        values = metrics['values']
+        latency = metrics['histograms'].get('capture_latency_seconds', {})
+        dropped = values.get('scheduler_dropped_frames', 0) + values.get('encoder_dropped_frames', 0)
+        xruns = (values.get('audio_input_overflows', 0) + values.get('audio_input_underflows', 0)
+                 + values.get('audio_ring_overflows', 0))
+        warning = (dropped, xruns) != self.metrics_totals
+        self.metrics_totals = (dropped, xruns)
+        details = (f"采集 {values.get('capture_fps', 0.0):.1f} fps | 编码 {values.get('encoder_fps', 0.0):.1f} fps | "
+                   f"丢帧 {dropped} | 编码队列 {values.get('encoder_queue_frames', 0)} 帧 "
+                   f"(滞后 {values.get('encoder_lag_seconds', 0.0) * 1000:.0f} ms) | "
+                   f"采集延迟 p95 {latency.get('p95', 0.0) * 1000:.1f} ms | 音频溢出 {xruns}")
+        self.metrics_label.setText(details)
+        self.recording_icon.set_metrics(f"{values.get('capture_fps', 0.0):.0f} fps", details, warning)
+
     def toggle_pause_recording(self):
         if self.recorder.recording:
             self.recorder.toggle_pause()
@@ -664,11 +789,9 @@ class ScreenRecorderUI(QWidget):
                 self.recording_timer.start()
 
     def stop_recording(self):
+        # 录制线程收尾后把导出任务加入队列并发出 recording_stopped，这里不等待
         self.recorder.stop_recording()
         self.recording_icon.start_stop_animation()
-        if self.recording_thread:
-            self.recording_thread.join()
-        self.export_video()
         # QApplication.instance().removeEventFilter(self)  # 在录制停止时移除事件过滤器
 
         if self.camera_checkbox.isChecked():
@@ -676,97 +799,143 @@ class ScreenRecorderUI(QWidget):
             self.camera_preview_window.hide()
             self.camera_timer.stop()
 
-    def export_video(self):
-        self.status_label.setText('正在处理视频...')
-        QApplication.processEvents()  # 确保UI更新
-
-        if self.subtitle_enabled:
-            self.status_label.setText('正在生成字幕...')
-            QApplication.processEvents()  # 确保UI更新
-            try:
-                base_name = os.path.splitext(self.output_file)[0]
-                self.output_file_with_subtitles = f"{base_name}_with_subtitles.mp4"
-                self.srt_file = f"{base_name}.srt"
-                
-                # 使用绝对路径
-                video_path = os.path.abspath(self.output_file)
-                output_path = os.path.abspath(self.output_file_with_subtitles)
-                srt_path = os.path.abspath(self.srt_file)
-                
-                original_video, srt_file, subtitled_video = process_video_with_subtitles(
-                    video_path,  # 原始视频路径
-                    output_path,  # 输出视频路径
-                    srt_path  # SRT 文件路径
-                )
-                
+    def submit_export(self, job, on_finished):
+        # 可在任意线程调用；任务在主线程中登记后加入队列，on_finished(job) 在任务结束后于主线程中调用
+        self.export_submitted.emit(job, on_finished)
+
+    def queue_export(self, job, on_finished):
+        self.export_handlers[job] = on_finished
+        self.export_queue.submit(job)
+
+    def on_export_updated(self, job):
+        # 导出任务的状态或进度变化时在主线程中调用
+        if job.status in FINISHED:
+            handler = self.export_handlers.pop(job, None)
+            if handler is not None:
+                handler(job)
+        pending = self.export_queue.pending()
+        running = [j for j in pending if j.status == RUNNING]
+        if not pending:
+            self.current_export = None
+            self.export_label.hide()
+            self.export_progress_bar.hide()
+            self.cancel_export_btn.hide()
+            return
+        self.current_export = running[0] if running else pending[0]
+        current = self.current_export
+        text = f"导出 {current.name}: {current.message or '排队中'} {current.progress:.0%}"
+        if current.eta is not None and current.status == RUNNING:
+            minutes, seconds = divmod(int(current.eta + 0.5), 60)
+            text += f"，剩余 {minutes:02d}:{seconds:02d}"
+        if len(pending) > 1:
+            text += f"（另有 {len(pending) - 1} 个排队）"
+        self.export_label.setText(text)
+        self.export_progress_bar.setValue(int(current.progress * 1000))
+        self.export_label.show()
+        self.export_progress_bar.show()
+        self.cancel_export_btn.show()
+
+    def cancel_export(self):
+        if self.current_export is not None:
+            self.current_export.cancel()
+            self.export_label.setText(f"正在取消 {self.current_export.name}...")
+
+    def show_export_error(self, title, text, job):
+        error = job.error
+        error_msg = QMessageBox()
+        error_msg.setIcon(QMessageBox.Critical)
+        error_msg.setText(text)
+        error_msg.setInformativeText(f"错误信息: {error}")
+        error_msg.setDetailedText("详细错误信息:\n" + ''.join(
+            traceback.format_exception(type(error), error, error.__traceback__)))
+        error_msg.setWindowTitle(title)
+        if not self.recorder.recording:  # 录制中不弹出对话框，只更新状态
+            error_msg.exec_()
+
+    def export_video(self, job, output_file, subtitles):
+        # 录制的导出任务结束时调用
+        if job.status == CANCELLED:
+            self.status_label.setText(f'已取消导出 {job.name}，录制分片保留在 {job.session_dir}，可稍后恢复。')
+            return
+        if job.status != DONE:
+            self.show_export_error("导出错误", "视频导出失败", job)
+            self.status_label.setText(f'视频导出失败: {job.error}')
+            return
+
+        if subtitles:
+            # 字幕由后处理管线转录，并与成片在同一次 ffmpeg 调用中封装
+            subtitled_video = job.result['subtitled_output']
+            srt_file = job.result['srt_file']
+            error = next(iter(job.result['errors'].values()), None)
+            if subtitled_video:
                 msg = QMessageBox()
                 msg.setIcon(QMessageBox.Information)
                 msg.setText("字幕生成完成")
-                msg.setInformativeText(f"原始视频: {original_video}\n"
+                msg.setInformativeText(f"原始视频: {output_file}\n"
                                        f"字幕文件: {srt_file}\n"
                                        f"带字幕的视频: {subtitled_video}")
                 msg.setWindowTitle("导出成功")
-                msg.exec_()
-                
+                if not self.recorder.recording:
+                    msg.exec_()
+
                 self.status_label.setText('字幕生成完成，所有文件已成功导出。')
-            except Exception as e:
+            else:
+                reason = str(error) if error else '录制中没有音频'
                 error_msg = QMessageBox()
                 error_msg.setIcon(QMessageBox.Critical)
                 error_msg.setText("字幕生成失败")
-                error_msg.setInformativeText(f"错误信息: {str(e)}")
-                error_msg.setDetailedText(f"详细错误信息:\n{traceback.format_exc()}")
+                error_msg.setInformativeText(f"错误信息: {reason}")
+                if error is not None:
+                    error_msg.setDetailedText("详细错误信息:\n" + ''.join(
+                        traceback.format_exception(type(error), error, error.__traceback__)))
                 error_msg.setWindowTitle("导出错误")
-                error_msg.exec_()
-                
-                self.status_label.setText(f'字幕生成失败: {str(e)}')
+                if not self.recorder.recording:
+                    error_msg.exec_()
+
+                self.status_label.setText(f'字幕生成失败: {reason}')
         else:
-            self.status_label.setText('视频已成功导出。')
+            self.status_label.setText('视频导出成功。准备开始新的录制。')
 
         # 无论是否启用字幕，都确保重新识别按钮可用
         self.rerecognize_btn.setEnabled(True)
 
-        self.reset_all_parameters()
-        self.status_label.setText('视频导出成功。准备开始新的录制。')
-
     def rerecognize_audio(self):
         audio_file, _ = QFileDialog.getOpenFileName(self, "选择音频文件", "", "音频文件 (*.wav *.mp3)")
-        if audio_file:
-            self.status_label.setText('正在重新识别音频...')
-            try:
-                service = OpenAITranscriptionService()
-                transcript = service.transcribe_audio(audio_file)
-                if transcript and 'segments' in transcript:
-                    srt_content = service.generate_srt_subtitles(transcript)
-                    
-                    # 生成新的 SRT 文件
-                    base_name = os.path.splitext(audio_file)[0]
-                    srt_file = f"{base_name}_subtitles.srt"
+        if not audio_file:
+            self.status_label.setText('未选择音频文件，重新识别取消。')
+            return
 
-                    with open(srt_file, "w", encoding="utf-8") as f:
-                        f.write(srt_content)
-                    
-                    msg = QMessageBox()
-                    msg.setIcon(QMessageBox.Information)
-                    msg.setText("重新识别完成")
-                    msg.setInformativeText(f"字幕文件已生成: {srt_file}")
-                    msg.setWindowTitle("重新识别成功")
-                    msg.exec_()
-                    
-                    self.status_label.setText('重新识别完成，字幕文件已生成。')
-                else:
-                    raise ValueError("转录结果无效或缺少段落息")
-            except Exception as e:
-                error_msg = QMessageBox()
-                error_msg.setIcon(QMessageBox.Critical)
-                error_msg.setText("重新识别失败")
-                error_msg.setInformativeText(f"错误信息: {str(e)}")
-                error_msg.setDetailedText(f"详错误信息:\n{traceback.format_exc()}")
-                error_msg.setWindowTitle("重新识别错误")
-                error_msg.exec_()
-                
-                self.status_label.setText(f'重新识别失败: {str(e)}')
+        def rerecognize(job):
+            # 生成新的 SRT 文件；WAV 直接读取，其他格式才用 ffmpeg 解码
+            base_name = os.path.splitext(audio_file)[0]
+            pipeline = PostProcessPipeline(audio_file=audio_file)
+            pipeline.set_subtitles(f"{base_name}_subtitles.srt")
+            srt_file = pipeline.run(job)['srt_file']
+            if pipeline.errors:
+                raise next(iter(pipeline.errors.values()))
+            if not srt_file:
+                raise ValueError("转录结果无效或缺少段落信息")
+            return srt_file
+
+        self.status_label.setText('正在重新识别音频...')
+        self.submit_export(ExportJob(f"识别 {os.path.basename(audio_file)}", rerecognize), self.on_rerecognized)
+
+    def on_rerecognized(self, job):
+        if job.status == CANCELLED:
+            self.status_label.setText('重新识别已取消。')
+        elif job.status == DONE:
+            msg = QMessageBox()
+            msg.setIcon(QMessageBox.Information)
+            msg.setText("重新识别完成")
+            msg.setInformativeText(f"字幕文件已生成: {job.result}")
+            msg.setWindowTitle("重新识别成功")
+            if not self.recorder.recording:
+                msg.exec_()
+
+            self.status_label.setText('重新识别完成，字幕文件已生成。')
         else:
-            self.status_label.setText('未选择音频文件，重新识别取消。')
+            self.show_export_error("重新识别错误", "重新识别失败", job)
+            self.status_label.setText(f'重新识别失败: {job.error}')
 
     def reset_all_parameters(self):
         self.reset_recording_state()
@@ -806,6 +975,7 @@ class ScreenRecorderUI(QWidget):
 
     def toggle_subtitle(self, state):
         self.subtitle_enabled = state == Qt.Checked
+        self.live_subtitle_checkbox.setEnabled(self.subtitle_enabled)
 
     def update_fps(self, fps_text):
         fps = int(fps_text.split()[0])
@@ -814,7 +984,7 @@ class ScreenRecorderUI(QWidget):
         print(f"帧率已更新为: {fps} fps")
 
     def merge_video_subtitle(self):
-        video_file, _ = QFileDialog.getOpenFileName(self, "选择视频文件", "", "视频文件 (*.mp4 *.avi *.mov)")
+        video_file, _ = QFileDialog.getOpenFileName(self, "选择视频文件", "", "视频文件 (*.mp4 *.mkv *.webm *.avi *.mov)")
         if not video_file:
             return
 
@@ -822,20 +992,24 @@ class ScreenRecorderUI(QWidget):
         if not srt_file:
             return
 
-        output_file, _ = QFileDialog.getSaveFileName(self, "保存合并后的视频", "", "视频文件 (*.mp4)")
+        output_file, _ = QFileDialog.getSaveFileName(self, "保存合并后的视频", "", "视频文件 (*.mp4 *.mkv *.mov *.webm)")
         if not output_file:
             return
-
-        try:
-            self.status_label.setText('正在合并视频和字幕...')
-            QApplication.processEvents()  # 更新UI
-
-            original_video, srt_file, subtitled_video = process_video_with_subtitles(
-                video_file,
-                output_file,
-                srt_file
-            )
-
+        if os.path.splitext(output_file)[1].lower().lstrip('.') not in CONTAINERS:
+            output_file += '.mp4'
+
+        burn_in = self.burn_in_checkbox.isChecked()
+        job = ExportJob(f"合并 {os.path.basename(output_file)}",
+                        lambda job: process_video_with_subtitles(video_file, output_file, srt_file,
+                                                                 burn_in=burn_in, job=job))
+        self.status_label.setText('正在合并视频和字幕...')
+        self.submit_export(job, self.on_video_subtitle_merged)
+
+    def on_video_subtitle_merged(self, job):
+        if job.status == CANCELLED:
+            self.status_label.setText('合并已取消。')
+        elif job.status == DONE:
+            original_video, srt_file, subtitled_video = job.result
             msg = QMessageBox()
             msg.setIcon(QMessageBox.Information)
             msg.setText("视频和字幕合并完成")
@@ -843,19 +1017,13 @@ class ScreenRecorderUI(QWidget):
                                    f"字幕文件: {srt_file}\n"
                                    f"带字幕的视频: {subtitled_video}")
             msg.setWindowTitle("合并成功")
-            msg.exec_()
+            if not self.recorder.recording:
+                msg.exec_()
 
             self.status_label.setText('视频和字幕合并完成。')
-        except Exception as e:
-            error_msg = QMessageBox()
-            error_msg.setIcon(QMessageBox.Critical)
-            error_msg.setText("合并失败")
-            error_msg.setInformativeText(f"错误信息: {str(e)}")
-            error_msg.setDetailedText(f"详细错误信息:\n{traceback.format_exc()}")
-            error_msg.setWindowTitle("合并错误")
-            error_msg.exec_()
-
-            self.status_label.setText(f'合并失败: {str(e)}')
+        else:
+            self.show_export_error("合并错误", "合并失败", job)
+            self.status_label.setText(f'合并失败: {job.error}')
 
     def toggle_camera(self, state):
         if state == Qt.Checked:
@@ -869,12 +1037,15 @@ class ScreenRecorderUI(QWidget):
             self.camera_timer.stop()
 
     def update_camera_preview(self):
+        # 摄像头在后台线程读取，这里只取最新一帧，没有新帧时跳过
         try:
             frame = self.recorder.get_camera_frame()
             if frame is not None:
                 self.camera_preview_window.update_preview(frame)
-            else:
-                logging.warning("Camera frame is None")
+            elif self.recorder.camera is not None and self.recorder.camera.error is not None:
+                logging.warning(f"Camera error: {self.recorder.camera.error}")
+                self.stop_camera()
+                self.camera_preview_window.hide()
         except Exception as e:
             logging.error(f"Error updating camera preview: {e}")
 
@@ -883,81 +1054,19 @@ class ScreenRecorderUI(QWidget):
         self.camera_checkbox.setChecked(False)
         self.camera_timer.stop()
 
-def process_video_with_subtitles(video_path, output_path, srt_path):
-    try:
-        # 检查原始视频文件是否存在
-        if not os.path.exists(video_path):
-            raise FileNotFoundError(f"原始视频文件不存在: {video_path}")
-
-        # 检查 SRT 文件是否存在，如果不存在则尝试生成
-        if not os.path.exists(srt_path):
-            print(f"警告: SRT 文件不存在: {srt_path}")
-            print("将尝试生成 SRT 文件...")
-            
-            # 这里添加生成 SRT 文件的代码
-            service = OpenAITranscriptionService()
-            transcript = service.transcribe_audio(video_path)
-            if transcript and 'segments' in transcript:
-                srt_content = service.generate_srt_subtitles(transcript)
-                with open(srt_path, "w", encoding="utf-8") as f:
-                    f.write(srt_content)
-                print(f"SRT 文件已生成: {srt_path}")
-            else:
-                raise ValueError("无法生成 SRT 文件")
-
-        # 再次检查 SRT 文件是否存在
-        if not os.path.exists(srt_path):
-            raise FileNotFoundError(f"SRT 文件生成失败: {srt_path}")
-
-        # 检查原始视频是否包含音频流
-        probe = ffmpeg.probe(video_path)
-        audio_stream = next((stream for stream in probe['streams'] if stream['codec_type'] == 'audio'), None)
-        
-        if audio_stream is None:
-            print("警告：原始视频不包含音频流")
-
-        # 使用 FFmpeg 添加字幕
-        try:
-            subtitle_style = (
-                'FontName=SimHei,'
-                'FontSize=15,'
-                'PrimaryColour=&H00FFFFFF,'  # 白色
-                'OutlineColour=&H000000,'  # 纯黑色轮廓
-                'BackColour=&H80000000,'     # 半透明背景
-                'Bold=1,'
-                'Shadow=0,'
-                'Alignment=2'                # 底部居中
-            )
-            
-            input_video = ffmpeg.input(video_path)
-            
-            # 如果有音频流，则复制音频；否则不处理音频
-            if audio_stream:
-                audio = input_video.audio
-            else:
-                audio = None
-            
-            video = (
-                input_video
-                .filter('subtitles', filename=srt_path, force_style=subtitle_style)
-            )
-            
-            output = ffmpeg.output(video, audio, output_path, vcodec='libx264', acodec='aac' if audio_stream else None)
-            output = output.overwrite_output()
-            
-            ffmpeg.run(output, capture_stdout=True, capture_stderr=True)
-            
-        except ffmpeg.Error as e:
-            logging.error(f"FFmpeg 错误:\nSTDOUT:\n{e.stdout.decode('utf8')}\nSTDERR:\n{e.stderr.decode('utf8')}")
-            raise
-
-        logging.info("视频处理成功完成")
-        return video_path, srt_path, output_path
-
-    except Exception as e:
-        logging.error(f"处理视频时发生错误: {str(e)}")
-        logging.error(f"详细错误信息: {traceback.format_exc()}")
-        raise
+    def closeEvent(self, event):
+        pending = self.export_queue.pending()
+        if pending:
+            reply = QMessageBox.question(self, "导出未完成",
+                                         f"还有 {len(pending)} 个导出任务未完成，退出将取消它们。"
+                                         f"已取消的录制可稍后从分片恢复。确定退出吗？",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply != QMessageBox.Yes:
+                event.ignore()
+                return
+        # 取消后等待 ffmpeg 进程被终止，不留下孤儿进程
+        self.export_queue.shutdown(cancel=True, wait=True)
+        event.accept()
 
 if __name__ == '__main__':
     try:
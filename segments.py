@@ -0,0 +1,159 @@
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import tempfile
+import threading
+import ffmpeg
+from encoder import SEGMENT_LIST_NAME, mux_audio_video
+
+JOURNAL_NAME = 'session.json'
+SESSION_DIR_SUFFIX = '.recording'
+
+
+def create_session_dir(output_file):
+    """
+    在输出文件旁边创建本次录制的会话目录，进程崩溃后用户也能找到。
+    目录名带开始时间和随机后缀，同一输出路径的新录制不会写进仍在排队导出的旧会话。
+    """
+    base = os.path.splitext(os.path.abspath(output_file))[0]
+    prefix = f"{os.path.basename(base)}.{time.strftime('%Y%m%d-%H%M%S')}-"
+    return tempfile.mkdtemp(prefix=prefix, suffix=SESSION_DIR_SUFFIX, dir=os.path.dirname(base))
+
+
+class SessionJournal:
+    """
+    录制会话日志：记录输出参数、音频文件和音视频起始时间戳。
+    已完成的视频分片由 ffmpeg 追加到 segments.ffconcat，两者一起构成恢复所需的全部信息。
+    """
+
+    def __init__(self, session_dir):
+        self.session_dir = session_dir
+        self.path = os.path.join(session_dir, JOURNAL_NAME)
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def update(self, **fields):
+        # 音频线程和采集线程都会更新日志，加锁串行化；每次写入用独立的临时文件再替换，
+        # 崩溃时日志要么是旧版本要么是新版本，不会写坏
+        with self.lock:
+            self.data.update(fields)
+            fd, temp_path = tempfile.mkstemp(prefix=JOURNAL_NAME + '.', suffix='.tmp', dir=self.session_dir)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self.data, f, ensure_ascii=False, indent=2)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+                raise
+
+    @classmethod
+    def load(cls, session_dir):
+        journal = cls(session_dir)
+        with open(journal.path, 'r', encoding='utf-8') as f:
+            journal.data = json.load(f)
+        return journal
+
+
+def list_segments(session_dir, include_partial=True):
+    """
+    返回可用于拼接的分片文件名。日志中的分片都已完整写完；
+    include_partial 时再加上日志之后仍在写入的分片，分片 MP4 截断后前面的片段仍可读。
+    """
+    listed = []
+    list_path = os.path.join(session_dir, SEGMENT_LIST_NAME)
+    if os.path.exists(list_path):
+        with open(list_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('file '):
+                    listed.append(line[5:].strip().strip("'"))
+    listed = [name for name in listed
+              if os.path.exists(os.path.join(session_dir, name)) and os.path.getsize(os.path.join(session_dir, name)) > 0]
+    if include_partial:
+        existing = sorted(os.path.basename(p) for p in glob.glob(os.path.join(session_dir, 'segment_*.mp4')))
+        last = listed[-1] if listed else ''
+        for name in existing:
+            if name > last and os.path.getsize(os.path.join(session_dir, name)) > 0:
+                listed.append(name)
+    return listed
+
+
+def write_concat_list(session_dir, segment_names, list_name='recovered.ffconcat'):
+    list_path = os.path.join(session_dir, list_name)
+    with open(list_path, 'w', encoding='utf-8') as f:
+        f.write('ffconcat version 1.0\n')
+        for name in segment_names:
+            f.write(f"file '{name}'\n")
+    return list_path
+
+
+def find_incomplete_sessions(directory):
+    """
+    查找目录下未正常结束的录制会话。
+    """
+    pattern = os.path.join(directory, f'*{SESSION_DIR_SUFFIX}')
+    return [d for d in sorted(glob.glob(pattern)) if os.path.exists(os.path.join(d, JOURNAL_NAME))]
+
+
+def recover_session(session_dir, output_file=None, remove_session=True):
+    """
+    用 concat 分离器拼接残留分片并合入音频，视频不重新编码。返回恢复出的文件路径。
+    """
+    journal = SessionJournal.load(session_dir)
+    data = journal.data
+    output_format = data.get('output_format', 'mp4')
+    if output_file is None:
+        base = os.path.splitext(data.get('output_file') or session_dir[:-len(SESSION_DIR_SUFFIX)])[0]
+        output_file = f"{base}_recovered.{output_format}"
+
+    audio_file = None
+    if data.get('audio_file'):
+        candidate = os.path.join(session_dir, data['audio_file'])
+        if os.path.exists(candidate) and os.path.getsize(candidate) > 0:
+            audio_file = candidate
+    audio_offset = 0.0
+    if audio_file and data.get('audio_start_pts') is not None:
+        audio_offset = data['audio_start_pts'] - (data.get('video_start_pts') or 0.0)
+
+    last_error = None
+    # 先尝试带上最后一个未写完的分片，失败再只用日志中已完成的分片
+    for include_partial in (True, False):
+        segment_names = list_segments(session_dir, include_partial)
+        if not segment_names:
+            raise FileNotFoundError(f"会话中没有可恢复的视频分片: {session_dir}")
+        list_path = write_concat_list(session_dir, segment_names)
+        try:
+            mux_audio_video(list_path, audio_file, output_file, output_format, audio_offset,
+                            data.get('encoder_profile'))
+            break
+        except ffmpeg.Error as e:
+            last_error = e
+            print(f"恢复失败 (include_partial={include_partial}): "
+                  f"{e.stderr.decode('utf8', errors='replace') if e.stderr else e}")
+    else:
+        raise last_error
+
+    print(f"已恢复 {len(segment_names)} 个分片: {output_file}")
+    if remove_session:
+        shutil.rmtree(session_dir, ignore_errors=True)
+    return output_file
+
+
+if __name__ == '__main__':
+    # 用法: python segments.py <会话目录或其所在目录> [输出文件]
+    if len(sys.argv) < 2:
+        print("用法: python segments.py <会话目录或其所在目录> [输出文件]")
+        sys.exit(1)
+    target = sys.argv[1]
+    sessions = [target] if os.path.exists(os.path.join(target, JOURNAL_NAME)) else find_incomplete_sessions(target)
+    if not sessions:
+        print(f"没有找到未完成的录制会话: {target}")
+    for session in sessions:
+        recover_session(session, sys.argv[2] if len(sys.argv) > 2 and len(sessions) == 1 else None,
+                        remove_session=False)
@@ -0,0 +1,164 @@
+import io
+import subprocess
+from math import gcd
+import numpy as np
+import soundfile as sf
+
+# 语音识别使用的采样率，Whisper 内部也是 16 kHz 单声道
+SAMPLE_RATE = 16000
+
+# 上传编码: 扩展名和 MIME 类型。opus 适合语音，24 kbps 约为 16 位 WAV 的 1/10
+UPLOAD_CODECS = {
+    'opus': ('ogg', 'audio/ogg'),
+    'flac': ('flac', 'audio/flac'),
+    'wav': ('wav', 'audio/wav'),
+}
+DEFAULT_UPLOAD_CODEC = 'opus'
+DEFAULT_UPLOAD_BITRATE = '24k'
+
+
+def load_audio(path, sample_rate=SAMPLE_RATE):
+    """
+    用 ffmpeg 把任意音频或视频文件解码为单声道 float32 采样，直接通过管道读取，不落临时文件。
+    """
+    command = [
+        'ffmpeg', '-nostdin', '-loglevel', 'error',
+        '-i', path,
+        '-vn',
+        '-f', 's16le',
+        '-acodec', 'pcm_s16le',
+        '-ac', '1',
+        '-ar', str(sample_rate),
+        '-'
+    ]
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"音频解码失败: {result.stderr.decode('utf8', errors='replace')}")
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def resample_to_speech(mono, sample_rate, target_rate=SAMPLE_RATE):
+    """
+    用多相滤波把单声道采样重采样到语音识别采样率。
+    """
+    if sample_rate == target_rate:
+        return np.asarray(mono, dtype=np.float32)
+    # scipy.signal 导入约需 1 秒，只在第一次重采样时导入（启动预热会提前在后台导入）
+    from scipy import signal
+    divisor = gcd(target_rate, sample_rate)
+    return signal.resample_poly(mono, target_rate // divisor, sample_rate // divisor).astype(np.float32)
+
+
+def load_recorded_audio(path, time_offset=0.0, sample_rate=SAMPLE_RATE, block_frames=1 << 18):
+    """
+    直接读取录制时写出的 PCM 文件，按块混成单声道后重采样，不经过 ffmpeg 解码。
+    time_offset 是音频起点相对视频起点的偏移，返回的采样与成片的时间轴对齐。
+    """
+    with sf.SoundFile(path) as f:
+        source_rate = f.samplerate
+        mono = np.empty(f.frames, dtype=np.float32)
+        position = 0
+        for block in f.blocks(blocksize=block_frames, dtype='float32', always_2d=True):
+            mono[position:position + len(block)] = block.mean(axis=1)
+            position += len(block)
+    samples = resample_to_speech(mono[:position], source_rate, sample_rate)
+    shift = int(round(time_offset * sample_rate))
+    if shift > 0:
+        samples = np.concatenate([np.zeros(shift, dtype=np.float32), samples])
+    elif shift < 0:
+        samples = samples[-shift:]
+    return samples
+
+
+def frame_energy_db(samples, sample_rate, frame_ms=30, smooth_ms=300):
+    """
+    逐帧计算能量 (dB)，再做滑动平均，切分点落在停顿里而不是音节之间。
+    """
+    frame_size = max(1, int(sample_rate * frame_ms / 1000))
+    frame_count = len(samples) // frame_size
+    if frame_count == 0:
+        return np.zeros(0, dtype=np.float32), frame_size
+    frames = samples[:frame_count * frame_size].reshape(frame_count, frame_size)
+    energy = np.mean(frames * frames, axis=1)
+    smooth = max(1, int(smooth_ms / frame_ms))
+    if smooth > 1 and frame_count >= smooth:
+        energy = np.convolve(energy, np.ones(smooth, dtype=np.float32) / smooth, mode='same')
+    return 10 * np.log10(energy + 1e-10), frame_size
+
+
+def split_on_silence(samples, sample_rate, max_chunk_seconds=300, search_seconds=30):
+    """
+    把音频切成不超过 max_chunk_seconds 的块，切分点取每块末尾 search_seconds 内能量最低的位置。
+    返回 [(start_sample, end_sample), ...]。
+    """
+    total = len(samples)
+    max_chunk = int(max_chunk_seconds * sample_rate)
+    if total <= max_chunk:
+        return [(0, total)]
+
+    energy_db, frame_size = frame_energy_db(samples, sample_rate)
+    search = int(min(search_seconds, max_chunk_seconds / 2) * sample_rate)
+    chunks = []
+    start = 0
+    while total - start > max_chunk:
+        window_end = start + max_chunk
+        window_start = window_end - search
+        first_frame = window_start // frame_size
+        last_frame = min(window_end // frame_size, len(energy_db))
+        if last_frame > first_frame:
+            quietest = first_frame + int(np.argmin(energy_db[first_frame:last_frame]))
+            cut = quietest * frame_size + frame_size // 2
+        else:
+            cut = window_end
+        chunks.append((start, cut))
+        start = cut
+    chunks.append((start, total))
+    return chunks
+
+
+def encode_wav(samples, sample_rate=SAMPLE_RATE):
+    """
+    把采样编码为内存中的 16 位 WAV，返回 bytes。
+    """
+    buffer = io.BytesIO()
+    sf.write(buffer, samples, sample_rate, format='WAV', subtype='PCM_16')
+    return buffer.getvalue()
+
+
+def encode_flac(samples, sample_rate=SAMPLE_RATE):
+    buffer = io.BytesIO()
+    sf.write(buffer, samples, sample_rate, format='FLAC', subtype='PCM_16')
+    return buffer.getvalue()
+
+
+def encode_opus(samples, sample_rate=SAMPLE_RATE, bitrate=DEFAULT_UPLOAD_BITRATE):
+    """
+    通过 ffmpeg 管道编码为 Ogg/Opus，使用语音模式 (voip) 和固定码率。
+    """
+    pcm = np.clip(np.asarray(samples, dtype=np.float32) * 32768.0, -32768, 32767).astype(np.int16)
+    command = [
+        'ffmpeg', '-nostdin', '-loglevel', 'error',
+        '-f', 's16le', '-ar', str(sample_rate), '-ac', '1', '-i', '-',
+        '-c:a', 'libopus', '-b:a', bitrate, '-application', 'voip',
+        '-f', 'ogg', '-'
+    ]
+    result = subprocess.run(command, input=pcm.tobytes(), capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Opus 编码失败: {result.stderr.decode('utf8', errors='replace')}")
+    return result.stdout
+
+
+def encode_upload(samples, sample_rate=SAMPLE_RATE, codec=DEFAULT_UPLOAD_CODEC, bitrate=DEFAULT_UPLOAD_BITRATE):
+    """
+    按上传编码把采样编码为内存中的文件，返回 (bytes, 扩展名, MIME 类型)。
+    """
+    if codec not in UPLOAD_CODECS:
+        raise ValueError(f"未知的上传编码: {codec}，可选: {', '.join(UPLOAD_CODECS)}")
+    extension, mime_type = UPLOAD_CODECS[codec]
+    if codec == 'opus':
+        payload = encode_opus(samples, sample_rate, bitrate)
+    elif codec == 'flac':
+        payload = encode_flac(samples, sample_rate)
+    else:
+        payload = encode_wav(samples, sample_rate)
+    return payload, extension, mime_type
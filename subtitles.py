@@ -0,0 +1,154 @@
+import re
+
+# 句末标点：遇到时结束当前字幕条，标点本身不显示
+SENTENCE_END = frozenset('.。!！?？')
+# 拉丁文字按词切分，中日文字符和标点逐个切分，长句也能按字符数换条；第一组是前面的空白
+TOKEN_PATTERN = re.compile(r'(\s*)([^\W\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff]+|\S)')
+# 显示时占两个字符宽度的全角字符
+WIDE_PATTERN = re.compile('[\u1100-\u115f\u2e80-\u303e\u3041-\u33ff\u3400-\u4dbf\u4e00-\u9fff'
+                          '\ua000-\ua4cf\uac00-\ud7a3\uf900-\ufaff\ufe30-\ufe4f\uff00-\uff60\uffe0-\uffe6]')
+
+
+def format_timestamp(seconds, separator=','):
+    """
+    把秒数格式化为 HH:MM:SS,mmm（SRT）或 HH:MM:SS.mmm（WebVTT）。先取整到毫秒，避免出现 60.000 秒。
+    """
+    millis = int(round(max(0.0, seconds) * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def display_width(text):
+    # 全角字符（中日文、全角标点）按两个字符宽度计算
+    if text.isascii():
+        return len(text)
+    return len(text) + len(WIDE_PATTERN.findall(text))
+
+
+def needs_space(previous, token):
+    # 词级时间戳不带空格时，拉丁文字与相邻的词之间（含逗号等之后）补空格，中文之间直接相连
+    last, first = previous[-1], token[0]
+    if not first.isalnum():
+        return False
+    if last in ',;:':
+        return first.isascii()
+    return last.isalnum() and (last.isascii() or first.isascii())
+
+
+def segment_tokens(segment, words):
+    """
+    返回段落内的 (文本, 开始, 结束, 前面是否有空格)。有词级时间戳时直接使用，
+    否则按字符位置在段落时间范围内线性插值，切开的字幕条之间不会重叠。
+    """
+    if words:
+        tokens = []
+        previous = None
+        for w in words:
+            token = w['word'].strip()
+            if not token:
+                continue
+            space = w['word'][0].isspace() or (previous is not None and needs_space(previous, token))
+            tokens.append((token, w['start'], w['end'], space))
+            previous = token
+        return tokens
+    text = segment['text'].strip()
+    if not text:
+        return []
+    start = segment['start']
+    scale = (segment['end'] - start) / len(text)
+    tokens = []
+    position = 0
+    for space, token in TOKEN_PATTERN.findall(text):
+        position += len(space)
+        token_start = start + position * scale
+        position += len(token)
+        tokens.append((token, token_start, start + position * scale, bool(space)))
+    return tokens
+
+
+def segment_words(transcript):
+    """
+    为每个段落找到对应的词级时间戳，只遍历一次词表。
+    词可能在段落内（segment['words']）或在顶层（timestamp_granularities 含 word 时）。
+    """
+    words = transcript.get('words') or []
+    index = 0
+    for segment in transcript.get('segments', []):
+        if segment.get('words'):
+            yield segment, segment['words']
+            continue
+        while index < len(words) and words[index]['start'] < segment['start'] - 0.01:
+            index += 1
+        first = index
+        while index < len(words) and words[index]['start'] < segment['end']:
+            index += 1
+        yield segment, words[first:index]
+
+
+def iter_cues(transcript, max_chars=40):
+    """
+    单遍生成字幕条 (开始, 结束, 文本)：每条显示宽度不超过 max_chars（全角字符算 2），
+    遇到句末标点换条，段落结束时换条。
+    """
+    previous_end = 0.0
+    for segment, words in segment_words(transcript):
+        parts = []
+        length = 0
+        cue_start = cue_end = None
+        for token, start, end, space in segment_tokens(segment, words):
+            if token in SENTENCE_END:
+                if parts:
+                    yield cue_start, cue_end, ''.join(parts)
+                    previous_end = cue_end
+                    parts, length = [], 0
+                continue
+            piece = ' ' + token if parts and space else token
+            width = display_width(piece)
+            if parts and length + width > max_chars:
+                yield cue_start, cue_end, ''.join(parts)
+                previous_end = cue_end
+                parts, length = [], 0
+                piece = token
+                width = display_width(piece)
+            if not parts:
+                cue_start = max(start, previous_end)
+            parts.append(piece)
+            length += width
+            cue_end = max(end, cue_start)
+        if parts:
+            yield cue_start, cue_end, ''.join(parts)
+            previous_end = cue_end
+
+
+def write_srt(cues, out):
+    """
+    把字幕条逐条写入文件对象或 list（调用其 write/append），返回写入的条数。
+    """
+    write = out.append if isinstance(out, list) else out.write
+    number = 0
+    for number, (start, end, text) in enumerate(cues, 1):
+        write(f"{number}\n{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n\n")
+    return number
+
+
+def write_vtt(cues, out):
+    write = out.append if isinstance(out, list) else out.write
+    write("WEBVTT\n\n")
+    number = 0
+    for number, (start, end, text) in enumerate(cues, 1):
+        write(f"{format_timestamp(start, '.')} --> {format_timestamp(end, '.')}\n{text}\n\n")
+    return number
+
+
+def build_srt(transcript, max_chars=40):
+    parts = []
+    write_srt(iter_cues(transcript, max_chars), parts)
+    return ''.join(parts)
+
+
+def build_vtt(transcript, max_chars=40):
+    parts = []
+    write_vtt(iter_cues(transcript, max_chars), parts)
+    return ''.join(parts)
@@ -0,0 +1,276 @@
+import os
+import json
+import time
+import threading
+from bisect import bisect_left
+
+# 耗时类直方图的桶上限（秒），覆盖 0.1 ms 到 1 s，30 fps 的帧间隔约 33 ms
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.033, 0.05, 0.1, 0.2, 0.5, 1.0)
+# 队列深度直方图的桶上限（帧数）
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128)
+
+METRICS_FORMATS = {'jsonl': '.metrics.jsonl', 'prometheus': '.metrics.prom'}
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help=''):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def reset(self):
+        self.value = 0
+
+
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self, name, help=''):
+        self.name = name
+        self.help = help
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def reset(self):
+        self.value = 0.0
+
+
+class Histogram:
+    """
+    固定桶直方图。observe() 只做一次二分查找和几次加法，可以在每帧的热路径上调用。
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, buckets=LATENCY_BUCKETS, help=''):
+        self.name = name
+        self.help = help
+        self.bounds = list(buckets)
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self.bounds) + 1)  # 最后一个桶为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """
+        按桶内线性插值估算分位数，落在 +Inf 桶时返回观测到的最大值。
+        """
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if cumulative + count >= target and count:
+                if index == len(self.bounds):
+                    return self.max
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = min(self.bounds[index], self.max)
+                return lower + (upper - lower) * (target - cumulative) / count
+            cumulative += count
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'max': self.max,
+        }
+
+
+class Telemetry:
+    """
+    录制管线的轻量指标：计数器、仪表和直方图。
+
+    热路径上的每个指标只由一个线程写入（采集线程、音频回调或编码线程），因此不加锁。
+    已有对象上的计数（调度器、编码器、环形缓冲）通过 collector 在采样时读取，不增加热路径开销。
+    采样线程每隔 interval 秒生成一次快照并计算速率，界面读取 latest，
+    指定 path 时追加写入 JSON-lines，或按 Prometheus 文本格式整体替换文件。
+    """
+
+    def __init__(self, prefix='screen_recorder'):
+        self.prefix = prefix
+        self.metrics = {}
+        self.collectors = []
+        self.rates = {}
+        self.latest = {}
+        self.previous = None
+        self.started_at = None
+        self.path = None
+        self.format = 'jsonl'
+        self.interval = 1.0
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def _add(self, metric):
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help=''):
+        return self._add(Counter(name, help))
+
+    def gauge(self, name, help=''):
+        return self._add(Gauge(name, help))
+
+    def histogram(self, name, buckets=LATENCY_BUCKETS, help=''):
+        return self._add(Histogram(name, buckets, help))
+
+    def add_collector(self, func, kind='gauge'):
+        """
+        注册采样时调用的 func() -> {名称: 数值}。kind 为 'counter' 时在 Prometheus 输出中按计数器导出。
+        """
+        self.collectors.append((func, kind))
+
+    def add_rate(self, name, source):
+        """
+        采样时把计数 source 的增量换算为每秒速率，保存为 name。
+        """
+        self.rates[name] = source
+
+    def reset(self):
+        for metric in self.metrics.values():
+            metric.reset()
+        self.previous = None
+        self.latest = {}
+
+    def snapshot(self):
+        values = {}
+        kinds = {}
+        histograms = {}
+        for name, metric in self.metrics.items():
+            if metric.kind == 'histogram':
+                histograms[name] = metric.summary()
+            else:
+                values[name] = metric.value
+                kinds[name] = metric.kind
+        for func, kind in self.collectors:
+            try:
+                collected = func()
+            except Exception as e:
+                print(f"指标采集失败: {e}")
+                continue
+            for name, value in collected.items():
+                values[name] = value
+                kinds[name] = kind
+        return {'time': time.time(), 'monotonic': time.monotonic(), 'values': values, 'kinds': kinds,
+                'histograms': histograms}
+
+    def sample(self):
+        """
+        生成快照并计算速率，保存到 latest（整体替换，读取方无需加锁）。
+        """
+        snapshot = self.snapshot()
+        previous = self.previous
+        for name, source in self.rates.items():
+            rate = 0.0
+            if previous is not None and source in snapshot['values'] and source in previous['values']:
+                elapsed = snapshot['monotonic'] - previous['monotonic']
+                if elapsed > 0:
+                    rate = (snapshot['values'][source] - previous['values'][source]) / elapsed
+            snapshot['values'][name] = rate
+            snapshot['kinds'][name] = 'gauge'
+        if self.started_at is not None:
+            snapshot['elapsed'] = snapshot['monotonic'] - self.started_at
+        self.previous = snapshot
+        self.latest = snapshot
+        return snapshot
+
+    def start(self, path=None, format='jsonl', interval=1.0):
+        """
+        开始按 interval 采样；path 为空时只更新 latest，不写文件。
+        """
+        if format not in METRICS_FORMATS:
+            raise ValueError(f"未知的指标格式: {format}，可选: {', '.join(METRICS_FORMATS)}")
+        self.stop()
+        self.reset()
+        self.path = path
+        self.format = format
+        self.interval = interval
+        self.started_at = time.monotonic()
+        if path and format == 'jsonl' and os.path.exists(path):
+            os.remove(path)
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='telemetry', daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.write(self.sample())
+
+    def stop(self):
+        """
+        停止采样，写入最后一次快照并返回它。
+        """
+        if self.thread is None:
+            return self.latest
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        snapshot = self.sample()
+        self.write(snapshot)
+        return snapshot
+
+    def write(self, snapshot):
+        if not self.path:
+            return
+        try:
+            if self.format == 'jsonl':
+                record = {'time': snapshot['time'], 'elapsed': snapshot.get('elapsed', 0.0)}
+                record.update(snapshot['values'])
+                record.update(snapshot['histograms'])
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + '\n')
+            else:
+                # 整体写入临时文件再替换，读取方（例如 node_exporter 文本收集器）不会读到写了一半的文件
+                temp_path = f"{self.path}.tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    f.write(self.to_prometheus(snapshot))
+                os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"写入指标文件失败: {e}")
+
+    def to_prometheus(self, snapshot):
+        lines = []
+        for name, value in snapshot['values'].items():
+            kind = snapshot['kinds'].get(name, 'gauge')
+            metric = f"{self.prefix}_{name}{'_total' if kind == 'counter' else ''}"
+            help_text = getattr(self.metrics.get(name), 'help', '')
+            if help_text:
+                lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"{metric} {value}")
+        for name in snapshot['histograms']:
+            histogram = self.metrics[name]
+            metric = f"{self.prefix}_{name}"
+            if histogram.help:
+                lines.append(f"# HELP {metric} {histogram.help}")
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.bounds + ['+Inf'], histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"{metric}_sum {histogram.sum}")
+            lines.append(f"{metric}_count {histogram.count}")
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,45 @@
+import os
+import sys
+import json
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from segments import JOURNAL_NAME, SESSION_DIR_SUFFIX, SessionJournal, create_session_dir, find_incomplete_sessions
+
+
+def test_journal_updates_from_two_threads(tmp_path):
+    # 录制时音频线程和采集线程同时更新日志，不能因为共用临时文件而失败
+    journal = SessionJournal(str(tmp_path))
+    errors = []
+
+    def writer(name):
+        try:
+            for i in range(300):
+                journal.update(**{name: i})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(name,)) for name in ('audio', 'video')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with open(os.path.join(str(tmp_path), JOURNAL_NAME), 'r', encoding='utf-8') as f:
+        assert json.load(f) == {'audio': 299, 'video': 299}
+    assert os.listdir(str(tmp_path)) == [JOURNAL_NAME]
+
+
+def test_each_recording_gets_its_own_session_dir(tmp_path):
+    output_file = os.path.join(str(tmp_path), 'rec.mp4')
+    first = create_session_dir(output_file)
+    second = create_session_dir(output_file)
+    assert first != second
+    for session_dir in (first, second):
+        assert os.path.isdir(session_dir)
+        assert session_dir.endswith(SESSION_DIR_SUFFIX)
+        assert os.path.basename(session_dir).startswith('rec.')
+        SessionJournal(session_dir).update(output_file=output_file)
+    assert find_incomplete_sessions(str(tmp_path)) == sorted([first, second])
@@ -0,0 +1,43 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcript_cache import TranscriptCache, transcript_key
+
+
+def speech_like(seconds=2.0, sample_rate=16000):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (0.3 * np.sin(2 * np.pi * 220 * t) * (1 + np.sin(2 * np.pi * 3 * t))).astype(np.float32)
+
+
+def test_same_pcm_and_params_give_same_key():
+    samples = speech_like()
+    assert transcript_key(samples, 16000, model='whisper-1') == transcript_key(samples.copy(), 16000, model='whisper-1')
+
+
+def test_params_and_sample_rate_change_the_key():
+    samples = speech_like()
+    key = transcript_key(samples, 16000, model='whisper-1', language='zh')
+    assert key != transcript_key(samples, 16000, model='whisper-1', language='en')
+    assert key != transcript_key(samples, 8000, model='whisper-1', language='zh')
+
+
+def test_key_is_per_decoded_pcm():
+    # 同一段音频经过有损编码或音视频偏移补齐后采样不同，不共享缓存条目
+    samples = speech_like()
+    key = transcript_key(samples, 16000)
+    lossy = samples + np.random.default_rng(0).normal(0, 1e-3, samples.shape).astype(np.float32)
+    shifted = np.concatenate([np.zeros(160, dtype=np.float32), samples[:-160]])
+    assert transcript_key(lossy, 16000) != key
+    assert transcript_key(shifted, 16000) != key
+
+
+def test_cache_round_trip(tmp_path):
+    cache = TranscriptCache(str(tmp_path))
+    key = transcript_key(speech_like(), 16000, model='whisper-1')
+    assert cache.get(key) is None
+    transcript = {'text': '你好', 'segments': [{'start': 0.0, 'end': 1.0, 'text': '你好'}]}
+    cache.put(key, transcript)
+    assert cache.get(key) == transcript
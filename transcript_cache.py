@@ -0,0 +1,105 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'screen_recorder', 'transcripts')
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+
+def transcript_key(samples, sample_rate, **params):
+    """
+    由解码后的音频（16 位量化的单声道采样）和识别参数计算缓存键。
+    键只对应这一段 PCM：有损编码、不同的重采样实现或按音视频偏移补齐/裁剪都会改变采样，得到不同的键，
+    所以从导出的视频重新识别不会命中录制时由录音文件写入的条目。
+    """
+    digest = hashlib.sha256()
+    pcm = np.clip(np.asarray(samples, dtype=np.float32) * 32768.0, -32768, 32767).astype(np.int16)
+    digest.update(str(sample_rate).encode('utf8'))
+    digest.update(pcm.tobytes())
+    digest.update(json.dumps(params, sort_keys=True, ensure_ascii=False).encode('utf8'))
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """
+    按内容寻址的转录结果磁盘缓存，每个条目是一个 verbose_json 文件。
+    命中时更新文件修改时间，超过 max_bytes 时按修改时间淘汰最久未用的条目。
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or os.environ.get('TRANSCRIPT_CACHE_DIR') or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        path = self.path_for(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                transcript = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return transcript
+
+    def put(self, key, transcript):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path_for(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(transcript, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def evict(self):
+        """
+        删除最久未使用的条目，直到缓存总大小不超过 max_bytes。
+        """
+        with self._lock:
+            entries = []
+            total = 0
+            try:
+                names = os.listdir(self.cache_dir)
+            except OSError:
+                return
+            for name in names:
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+                total += stat.st_size
+            entries.sort()
+            for _, size, name in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue
+                total -= size
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.cache_dir) if os.path.isdir(self.cache_dir) else []:
+                if name.endswith('.json'):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = TranscriptCache()
+    return _default_cache
@@ -0,0 +1,128 @@
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+# 这些状态码表示服务端暂时不可用或限流，值得重试
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TranscriptionError(Exception):
+    """
+    转录请求最终失败。status_code 为最后一次响应的状态码（网络错误时为 None）。
+    """
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """
+    令牌桶限流：每秒补充 rate 个令牌，最多积累 capacity 个，多个线程共享。
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class TranscriptionClient:
+    """
+    Whisper 兼容接口的 HTTP 客户端：持久连接池、连接/读取超时、
+    对 429 和 5xx 按指数退避重试（优先遵守 Retry-After），并用令牌桶限制并发调用方的请求速率。
+    """
+
+    def __init__(self, url, api_key='', connect_timeout=10, read_timeout=300, max_retries=4,
+                 backoff_base=1.0, backoff_max=30.0, rate=2.0, burst=4, pool_size=8):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(rate, burst)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if api_key:
+            self.session.headers['Authorization'] = f"Bearer {api_key}"
+
+    def backoff(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.backoff_max)
+                except ValueError:
+                    pass
+        delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        # 加入抖动，避免多个分块同时重试
+        return delay * (0.5 + random.random() / 2)
+
+    def transcribe(self, audio, filename, data, content_type=None):
+        """
+        上传音频并返回解析后的 JSON。audio 可以是 bytes 或可 seek 的文件对象。
+        """
+        start_position = audio.tell() if hasattr(audio, 'seek') else None
+        file_field = (filename, audio, content_type) if content_type else (filename, audio)
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if start_position is not None:
+                audio.seek(start_position)
+            self.bucket.acquire()
+            response = None
+            try:
+                response = self.session.post(self.url, files={"file": file_field}, data=data,
+                                             timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = TranscriptionError(f"请求失败: {e}")
+            else:
+                if response.status_code < 400:
+                    return response.json()
+                last_error = TranscriptionError(
+                    f"HTTP {response.status_code}: {response.text[:500]}", response.status_code)
+                if response.status_code not in RETRY_STATUSES:
+                    raise last_error
+            if attempt < self.max_retries:
+                delay = self.backoff(attempt, response)
+                print(f"转录请求失败 ({last_error})，{delay:.1f} 秒后第 {attempt + 1} 次重试")
+                time.sleep(delay)
+        raise last_error
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(url, api_key=''):
+    """
+    按 (url, api_key) 复用客户端，连接池和限流在多次调用之间共享。
+    """
+    key = (url, api_key)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = TranscriptionClient(url, api_key)
+            _clients[key] = client
+        return client
@@ -0,0 +1,94 @@
+import time
+import threading
+import subprocess
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def probe_ffmpeg(binary='ffmpeg'):
+    """
+    检查 ffmpeg 是否可用，返回版本行；不可用时抛出 RuntimeError。结果按进程缓存。
+    """
+    try:
+        result = subprocess.run([binary, '-version'], check=True, capture_output=True, text=True)
+    except FileNotFoundError:
+        raise RuntimeError("FFmpeg 未找到。请确保 FFmpeg 已安装并添加到系统路径中。")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"FFmpeg 不可用: {e}")
+    return result.stdout.splitlines()[0] if result.stdout else binary
+
+
+@lru_cache(maxsize=None)
+def list_audio_devices():
+    """
+    返回音频设备列表（sounddevice.query_devices 的结果）。导入 sounddevice 会初始化 PortAudio 并枚举设备，
+    因此只在第一次调用时执行。
+    """
+    import sounddevice as sd
+    return tuple(dict(device) for device in sd.query_devices())
+
+
+class Warmup:
+    """
+    在后台线程中按顺序执行启动时的探测任务（ffmpeg、音频设备、采集后端、重模块预导入），
+    窗口无需等待即可显示。每个任务的结果或异常只计算一次并缓存，result() 可以阻塞等待。
+    """
+
+    def __init__(self, on_done=None):
+        self.tasks = []
+        self.results = {}
+        self.errors = {}
+        self.timings = {}
+        self.events = {}
+        self.on_done = on_done  # 在后台线程中调用 on_done(name)，UI 需自行转到主线程
+        self.thread = None
+
+    def add(self, name, func, *args):
+        self.tasks.append((name, func, args))
+        self.events[name] = threading.Event()
+        return self
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='warmup', daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        for name, func, args in self.tasks:
+            start = time.perf_counter()
+            try:
+                self.results[name] = func(*args)
+            except Exception as e:
+                self.errors[name] = e
+            self.timings[name] = time.perf_counter() - start
+            self.events[name].set()
+            if self.on_done is not None:
+                self.on_done(name)
+
+    def done(self, name):
+        return self.events[name].is_set()
+
+    def result(self, name, timeout=None):
+        """
+        等待任务完成并返回结果；任务失败时重新抛出其异常。
+        """
+        if not self.events[name].wait(timeout):
+            raise TimeoutError(f"预热任务 {name} 未在 {timeout} 秒内完成")
+        if name in self.errors:
+            raise self.errors[name]
+        return self.results[name]
+
+    def wait(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+        return all(event.is_set() for event in self.events.values())
+
+
+def preload_modules(*names):
+    """
+    预先导入录制和导出时才用到的重模块，后续的惰性导入直接命中 sys.modules。
+    """
+    import importlib
+    for name in names:
+        importlib.import_module(name)
+    return names